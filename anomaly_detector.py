@@ -0,0 +1,112 @@
+# anomaly_detector.py
+import math
+from config import (
+    ANOMALY_EWMA_ALPHA, ANOMALY_REJECT_Z, ANOMALY_SURGE_Z, ANOMALY_SURGE_MIN_RATIO,
+    ANOMALY_WARMUP_SAMPLES, ANOMALY_MAX_REJECTIONS
+)
+
+# Utfall fra SpikeDetector.observe()
+OK = "ok"
+WARMUP = "warmup"
+REJECTED = "rejected"
+SURGE = "surge"
+
+
+class _GameStats:
+    __slots__ = ("mean", "var", "n", "last_good", "rejections")
+
+    def __init__(self):
+        self.mean = 0.0
+        self.var = 0.0
+        self.n = 0
+        self.last_good = None
+        self.rejections = 0
+
+
+class SpikeDetector:
+    """
+    Streaming per-game statistics (EWMA mean/variance) on the scraped player counts.
+    - Rejects bad samples: zero/negative counts and sudden collapses far below
+      the running mean (the last good value is used instead). If the low values
+      keep coming, they are accepted as a real change after ANOMALY_MAX_REJECTIONS.
+    - Flags surges: far above the running mean (z-score) and at least
+      ANOMALY_SURGE_MIN_RATIO above it in relative terms.
+    An accepted level shift (persistent drop or surge) restarts mean/variance at
+    the new level, so the jump itself does not inflate the variance.
+    """
+
+    def __init__(self, alpha: float = ANOMALY_EWMA_ALPHA, reject_z: float = ANOMALY_REJECT_Z,
+                 surge_z: float = ANOMALY_SURGE_Z, surge_min_ratio: float = ANOMALY_SURGE_MIN_RATIO,
+                 warmup: int = ANOMALY_WARMUP_SAMPLES, max_rejections: int = ANOMALY_MAX_REJECTIONS):
+        self.alpha = alpha
+        self.reject_z = reject_z
+        self.surge_z = surge_z
+        self.surge_min_ratio = surge_min_ratio
+        self.warmup = warmup
+        self.max_rejections = max_rejections
+        self.stats = {}
+
+    def _update(self, s: _GameStats, x: float):
+        if s.n == 0:
+            s.mean = float(x)
+        else:
+            diff = x - s.mean
+            incr = self.alpha * diff
+            s.mean += incr
+            s.var = (1 - self.alpha) * (s.var + diff * incr)
+        s.n += 1
+        s.last_good = x
+        s.rejections = 0
+
+    def _reset(self, s: _GameStats, x: float):
+        # Nytt nivå: gammel varians ville ellers gjort surge-deteksjonen blind en lang stund
+        s.mean = float(x)
+        s.var = 0.0
+        s.last_good = x
+        s.rejections = 0
+
+    def zscore(self, title: str, count: int) -> float:
+        s = self.stats.get(title)
+        if s is None or s.n == 0:
+            return 0.0
+        # Gulv på std så et helt flatt signal ikke gir uendelig z
+        std = max(math.sqrt(s.var), 1.0, 0.02 * s.mean)
+        return (count - s.mean) / std
+
+    def observe(self, title: str, count: int, fallback: int | None = None) -> tuple[int, str]:
+        """
+        Feed one scraped sample. Returns (count to use, verdict).
+        `fallback` is used for a rejected sample when there is no history yet.
+        """
+        s = self.stats.get(title)
+        if s is None:
+            s = self.stats[title] = _GameStats()
+
+        # Null/negativ = glitch i API-et, aldri en ekte måling
+        if count <= 0:
+            good = s.last_good if s.last_good is not None else fallback
+            if good:
+                return good, REJECTED
+            return max(count, 0), WARMUP
+
+        if s.n < self.warmup:
+            self._update(s, count)
+            return count, WARMUP
+
+        z = self.zscore(title, count)
+        if z < -self.reject_z:
+            if s.rejections < self.max_rejections:
+                s.rejections += 1
+                print(f"⚠️ {title}: rejected sample {count} (z={z:.1f}, mean={s.mean:.0f})")
+                return s.last_good, REJECTED
+            print(f"📉 {title}: accepting new level {count} after {s.rejections} rejections")
+            self._reset(s, count)
+            return count, OK
+
+        if z > self.surge_z and count > s.mean * (1 + self.surge_min_ratio):
+            # Det nye nivået er utgangspunktet for neste surge (ellers ser vi ikke trappetrinn)
+            self._reset(s, count)
+            print(f"🚨 {title}: surge detected {count} (z={z:.1f})")
+            return count, SURGE
+        self._update(s, count)
+        return count, OK
@@ -0,0 +1,88 @@
+# bench_decisions.py
+# Skaleringsbenchmark for beslutningssteget: kjører samme batch med 1..N workers og
+# sjekker at resultatet er identisk uansett antall workers.
+#
+#   python bench_decisions.py --titles 500 --max-workers 8 --kind both
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import scaling_algorithms
+from scaling_algorithms import GameSample
+from scaling_pipeline import compile_pipelines
+from decision_pool import DecisionPool
+
+STRATEGY_MIX = [
+    {"strategy": "predictive", "time_offset_hours": -6, "lookahead_intervals": 3, "buffer": 75},
+    {"strategy": "trend", "threshold_percent": 0.8},
+    {"strategy": "aggressive", "max_hourly_budget": 250},
+    {"strategy": "passive", "buffer": 5},
+]
+
+
+def _quiet():
+    """Worker initializer: no debug prints, no writes to the real vm_changes.log."""
+    sys.stdout = open(os.devnull, "w")
+    scaling_algorithms.LOG_FILE = os.path.join(tempfile.gettempdir(), "bench_vm_changes.log")
+
+
+def build_batch(n_titles: int):
+    game_config = {f"Bench Title {i}": STRATEGY_MIX[i % len(STRATEGY_MIX)] for i in range(n_titles)}
+    pipelines = compile_pipelines(game_config)
+    now = datetime(2025, 12, 11, 20, 35, tzinfo=ZoneInfo("Europe/Oslo"))
+    samples = [
+        GameSample(title, 5000 + 137 * i, 4800 + 131 * i, 2 + i % 5, now)
+        for i, title in enumerate(game_config)
+    ]
+    return pipelines, samples
+
+
+def run(pipelines, samples, workers: int, kind: str, repeat: int):
+    pool = DecisionPool(workers=workers, kind=kind, initializer=_quiet)
+    try:
+        pool.decide(pipelines, samples[:workers])  # varm opp workers
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results = pool.decide(pipelines, samples)
+            best = min(best, time.perf_counter() - start)
+    finally:
+        pool.shutdown()
+    return best, [(vm_count, expected) for vm_count, expected, _ in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the per-game decision stage.")
+    parser.add_argument("--titles", type=int, default=500)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--kind", choices=["thread", "process", "both"], default="both")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    real_stdout = sys.stdout
+    _quiet()  # strategienes debug-print ville druknet tabellen
+    pipelines, samples = build_batch(args.titles)
+    sys.stdout = real_stdout
+    kinds = ["thread", "process"] if args.kind == "both" else [args.kind]
+    worker_counts = sorted({1, *[2 ** i for i in range(1, 8) if 2 ** i < args.max_workers], args.max_workers})
+
+    print(f"📊 {args.titles} titles, {os.cpu_count()} CPU(s)")
+    print(f"{'Pool':8} {'Workers':>8} {'Best s':>10} {'Speedup':>8} {'Same result':>12}")
+    print("-" * 50)
+    for kind in kinds:
+        baseline = reference = None
+        for workers in worker_counts:
+            _quiet()
+            seconds, results = run(pipelines, samples, workers, kind, args.repeat)
+            sys.stdout = real_stdout
+            if baseline is None:
+                baseline, reference = seconds, results
+            same = "yes" if results == reference else "NO"
+            print(f"{kind:8} {workers:>8} {seconds:>10.4f} {baseline / seconds:>7.2f}x {same:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+# capacity_planner.py
+import itertools
+import math
+from typing import NamedTuple
+
+# Et "game server" er én server-prosess for ett spill. Flere servere (også fra ulike spill)
+# kan dele én VM, men én server kan aldri spenne over flere VMs.
+
+
+class Flavor(NamedTuple):
+    name: str
+    flavor_id: str
+    slots: int            # players one VM of this flavor can host
+    hourly_price: float
+
+
+class Server(NamedTuple):
+    title: str
+    slots: int
+
+
+class PlannedVM:
+    """One VM in a fleet plan and the game servers packed onto it."""
+    __slots__ = ("vm_id", "flavor", "servers", "used")
+
+    def __init__(self, vm_id: str, flavor: Flavor, servers=None):
+        self.vm_id = vm_id
+        self.flavor = flavor
+        self.servers = list(servers or [])
+        self.used = sum(s.slots for s in self.servers)
+
+    @property
+    def free(self) -> int:
+        return self.flavor.slots - self.used
+
+    def add(self, server: Server):
+        self.servers.append(server)
+        self.used += server.slots
+
+    def to_json(self) -> dict:
+        return {
+            "vm_id": self.vm_id,
+            "flavor": self.flavor.name,
+            "slots": self.flavor.slots,
+            "used": self.used,
+            "servers": [{"title": s.title, "slots": s.slots} for s in self.servers],
+        }
+
+
+class FleetPlan(NamedTuple):
+    vms: list
+    hourly_cost: float
+    moves: list
+
+    def to_json(self) -> dict:
+        return {
+            "vm_count": len(self.vms),
+            "hourly_cost": self.hourly_cost,
+            "vms": [vm.to_json() for vm in self.vms],
+            "moves": self.moves,
+        }
+
+
+def parse_flavors(raw: list) -> list[Flavor]:
+    """Validate flavor dicts from config into Flavor tuples (cheapest per slot first)."""
+    if not isinstance(raw, list) or not raw:
+        raise ValueError("'flavors' must be a non-empty list")
+    flavors = []
+    for f in raw:
+        try:
+            flavor = Flavor(str(f["name"]), str(f["flavor_id"]), f["slots"], f["hourly_price"])
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"invalid flavor {f!r}: {e}")
+        if not isinstance(flavor.slots, int) or flavor.slots <= 0:
+            raise ValueError(f"flavor '{flavor.name}': 'slots' must be a positive integer")
+        if not isinstance(flavor.hourly_price, (int, float)) or flavor.hourly_price <= 0:
+            raise ValueError(f"flavor '{flavor.name}': 'hourly_price' must be a positive number")
+        flavors.append(flavor)
+    flavors.sort(key=lambda f: (f.hourly_price / f.slots, -f.slots))
+    return flavors
+
+
+def game_demand(player_count: int, expected_players: float | None, headroom_percent: float) -> int:
+    """Player slots a game needs: max(current, forecast) plus headroom."""
+    load = max(player_count, expected_players or 0)
+    return max(1, math.ceil(load * (1 + headroom_percent / 100)))
+
+
+def split_servers(title: str, slots: int, max_server_slots: int) -> list[Server]:
+    """Split a game's demand into servers no larger than `max_server_slots`."""
+    full, rest = divmod(slots, max_server_slots)
+    servers = [Server(title, max_server_slots)] * full
+    if rest:
+        servers.append(Server(title, rest))
+    return servers
+
+
+def _cheapest_fit(used: int, flavors: list[Flavor]) -> Flavor:
+    return min((f for f in flavors if f.slots >= used), key=lambda f: (f.hourly_price, f.slots))
+
+
+def first_fit_decreasing(servers: list[Server], open_flavor: Flavor, flavors: list[Flavor],
+                         new_id, vms: list[PlannedVM] | None = None) -> list[PlannedVM]:
+    """
+    Pack servers (largest first) into the first VM with room; open a new VM of
+    `open_flavor` when none fits. Newly opened VMs are afterwards shrunk to the
+    cheapest flavor that still holds their servers.
+    """
+    vms = list(vms or [])
+    opened = []
+    for server in sorted(servers, key=lambda s: s.slots, reverse=True):
+        for vm in vms:
+            if vm.free >= server.slots:
+                vm.add(server)
+                break
+        else:
+            vm = PlannedVM(new_id(), open_flavor)
+            vm.add(server)
+            vms.append(vm)
+            opened.append(vm)
+    for vm in opened:
+        vm.flavor = _cheapest_fit(vm.used, flavors)
+    return vms
+
+
+def fleet_cost(vms: list[PlannedVM]) -> float:
+    return sum(vm.flavor.hourly_price for vm in vms)
+
+
+_TEMP_PREFIX = "new-"
+
+
+class CapacityPlanner:
+    """
+    Packs every game's server demand onto a mixed-flavor fleet each cycle and
+    plans the incremental moves from the previous plan.
+    """
+
+    def __init__(self, repack_min_saving: float = 0.1):
+        self.repack_min_saving = repack_min_saving
+        self.current: list[PlannedVM] = []
+        self._ids = itertools.count(1)
+
+    def _new_id(self) -> str:
+        return f"vm-{next(self._ids)}"
+
+    def _fresh_plan(self, servers, flavors, temp_id):
+        largest = max(s.slots for s in servers)
+        candidates = [f for f in flavors if f.slots >= largest]
+        plans = [first_fit_decreasing(servers, f, flavors, temp_id) for f in candidates]
+        return min(plans, key=fleet_cost)
+
+    def _sticky_plan(self, demands, flavors, max_server_slots, temp_id):
+        """Keep existing placements (trimmed to the new demand) and pack only the rest."""
+        remaining = dict(demands)
+        vms = []
+        for old in self.current:
+            flavor = next((f for f in flavors if f.name == old.flavor.name), None)
+            if flavor is None:
+                continue  # flavor fjernet fra configen → VMen fases ut
+            kept = []
+            for server in sorted(old.servers, key=lambda s: s.slots, reverse=True):
+                keep = min(server.slots, remaining.get(server.title, 0))
+                if keep > 0:
+                    kept.append(Server(server.title, keep))
+                    remaining[server.title] -= keep
+            if kept:
+                vms.append(PlannedVM(old.vm_id, flavor, kept))
+        rest = [s for title, slots in remaining.items() if slots > 0
+                for s in split_servers(title, slots, max_server_slots)]
+        if rest:
+            largest = max(s.slots for s in rest)
+            open_flavor = next(f for f in flavors if f.slots >= largest)
+            vms = first_fit_decreasing(rest, open_flavor, flavors, temp_id, vms)
+        return vms
+
+    def _assign_ids(self, vms):
+        """
+        Give newly planned VMs real ids. A new VM takes over an existing VM of the
+        same flavor that the plan no longer uses (the one sharing the most server
+        slots with it), so an unchanged VM is not stopped and started again.
+        """
+        taken = {vm.vm_id for vm in vms if not vm.vm_id.startswith(_TEMP_PREFIX)}
+        free = [old for old in self.current if old.vm_id not in taken]
+        pairs = sorted(
+            ((_overlap(old, vm), i, j) for i, vm in enumerate(vms) if vm.vm_id.startswith(_TEMP_PREFIX)
+             for j, old in enumerate(free) if old.flavor.name == vm.flavor.name),
+            key=lambda p: (-p[0], p[1], p[2]),
+        )
+        matched_new, matched_old = set(), set()
+        for _, i, j in pairs:
+            if i not in matched_new and j not in matched_old:
+                vms[i].vm_id = free[j].vm_id
+                matched_new.add(i)
+                matched_old.add(j)
+        for vm in vms:
+            if vm.vm_id.startswith(_TEMP_PREFIX):
+                vm.vm_id = self._new_id()
+
+    def _moves(self, vms):
+        old = {vm.vm_id: vm for vm in self.current}
+        new = {vm.vm_id: vm for vm in vms}
+        moves = [{"action": "stop_vm", "vm_id": vm_id, "flavor": vm.flavor.name}
+                 for vm_id, vm in old.items() if vm_id not in new]
+        for vm_id, vm in new.items():
+            if vm_id not in old:
+                moves.append({"action": "start_vm", "vm_id": vm_id, "flavor": vm.flavor.name})
+            before = {} if vm_id not in old else _slots_by_title(old[vm_id].servers)
+            after = _slots_by_title(vm.servers)
+            for title in sorted(before.keys() | after.keys()):
+                delta = after.get(title, 0) - before.get(title, 0)
+                if delta:
+                    moves.append({"action": "resize_server" if title in before and title in after
+                                  else "place_server" if delta > 0 else "remove_server",
+                                  "vm_id": vm_id, "title": title, "slots": delta})
+        return moves
+
+    def plan(self, demands: dict[str, int], flavors: list[Flavor], max_server_slots: int) -> FleetPlan:
+        """
+        demands: player slots per game (see game_demand).
+        Picks the cheaper of "keep current placements" and "repack from scratch";
+        a full repack is only chosen if it saves at least `repack_min_saving`.
+        """
+        max_server_slots = min(max_server_slots, max(f.slots for f in flavors))
+        servers = [s for title, slots in demands.items()
+                   for s in split_servers(title, slots, max_server_slots)]
+        if not servers:
+            vms = []
+        else:
+            # Kandidatplanene får midlertidige ids; bare den valgte planen får ekte ids
+            temp = itertools.count(1)
+            temp_id = lambda: f"{_TEMP_PREFIX}{next(temp)}"
+            fresh = self._fresh_plan(servers, flavors, temp_id)
+            sticky = self._sticky_plan(demands, flavors, max_server_slots, temp_id) if self.current else None
+            if sticky is not None and fleet_cost(fresh) > fleet_cost(sticky) * (1 - self.repack_min_saving):
+                vms = sticky
+            else:
+                vms = fresh
+            self._assign_ids(vms)
+
+        plan = FleetPlan(vms, fleet_cost(vms), self._moves(vms))
+        self.current = vms
+        return plan
+
+
+def _overlap(a: PlannedVM, b: PlannedVM) -> int:
+    """Server slots two VMs have in common, per game."""
+    before, after = _slots_by_title(a.servers), _slots_by_title(b.servers)
+    return sum(min(slots, after.get(title, 0)) for title, slots in before.items())
+
+
+def _slots_by_title(servers) -> dict:
+    totals = {}
+    for s in servers:
+        totals[s.title] = totals.get(s.title, 0) + s.slots
+    return totals
@@ -0,0 +1,214 @@
+# cluster.py
+import fcntl
+import hashlib
+import json
+import os
+import time
+from bisect import bisect
+from contextlib import contextmanager
+from config import LEASE_DIR, LEASE_TTL, MANAGER_ID, SHARD_DIR
+
+# Flere manager-replikaer koordinerer via filer på det delte data-volumet:
+#   <LEASE_DIR>/<member>.lease  – heartbeat med utløpstid (medlemskap)
+#   <LEASE_DIR>/leader.json     – lederens lease; fornyes hver sync, overtas når den er utløpt
+#   <LEASE_DIR>/leader.lock     – flock rundt les-sjekk-skriv av leader.json (holdes kort)
+#   <LEASE_DIR>/actuate-*.lock  – flock per spill mens OpenStack-endringer pågår
+# Spill fordeles på levende medlemmer med consistent hashing, så når en replika dør
+# (lease utløper) flyttes bare dens spill til de andre.
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent-hash ring with virtual nodes."""
+
+    def __init__(self, members, vnodes: int = 64):
+        self.members = sorted(members)
+        points = sorted((_hash(f"{m}#{i}"), m) for m in self.members for i in range(vnodes))
+        self._keys = [p[0] for p in points]
+        self._owners = [p[1] for p in points]
+
+    def owner(self, key: str) -> str | None:
+        if not self._keys:
+            return None
+        i = bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._owners[i]
+
+
+class LeaseStore:
+    """File-based lease store (stand-in for etcd/Consul on a shared volume)."""
+
+    def __init__(self, root: str = LEASE_DIR, ttl: float = LEASE_TTL):
+        self.root = root
+        self.ttl = ttl
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, member: str) -> str:
+        return os.path.join(self.root, f"{member}.lease")
+
+    def heartbeat(self, member: str):
+        tmp = self._path(member) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"member": member, "expires": time.time() + self.ttl}, f)
+        os.replace(tmp, self._path(member))  # atomisk: andre ser aldri en halv lease
+
+    def release(self, member: str):
+        try:
+            os.remove(self._path(member))
+        except FileNotFoundError:
+            pass
+
+    def members(self) -> list:
+        """Members whose lease has not expired."""
+        now = time.time()
+        live = []
+        for name in os.listdir(self.root):
+            if not name.endswith(".lease"):
+                continue
+            try:
+                with open(os.path.join(self.root, name)) as f:
+                    lease = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if lease.get("expires", 0) > now:
+                live.append(lease["member"])
+        return sorted(live)
+
+
+class ClusterMember:
+    """
+    This replica's view of the cluster: which games it owns and whether it is leader.
+    Call sync() once per cycle before using owns()/is_leader.
+    """
+
+    def __init__(self, member_id: str = MANAGER_ID, store: LeaseStore | None = None,
+                 shard_dir: str = SHARD_DIR):
+        self.member_id = member_id
+        self.store = store or LeaseStore()
+        self.shard_dir = shard_dir
+        os.makedirs(shard_dir, exist_ok=True)
+        self.ring = HashRing([member_id])
+        self.is_leader = False
+
+    @contextmanager
+    def _leader_lock(self):
+        with open(os.path.join(self.store.root, "leader.lock"), "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_leader(self) -> dict:
+        try:
+            with open(os.path.join(self.store.root, "leader.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _try_lead(self) -> bool:
+        """
+        Take or renew the leader lease. Another member's lease is respected until it
+        expires, so a hung leader loses leadership after LEASE_TTL – and a resumed
+        one finds its lease taken over and steps down.
+        """
+        path = os.path.join(self.store.root, "leader.json")
+        with self._leader_lock():
+            lease = self._read_leader()
+            now = time.time()
+            if lease.get("member") not in (None, self.member_id) and lease.get("expires", 0) > now:
+                leader = False
+            else:
+                with open(path + ".tmp", "w") as f:
+                    json.dump({"member": self.member_id, "expires": now + self.store.ttl}, f)
+                os.replace(path + ".tmp", path)
+                leader = True
+        if leader and not self.is_leader:
+            print(f"👑 {self.member_id} is now leader")
+        elif self.is_leader and not leader:
+            print(f"👑 {self.member_id} lost leadership to {lease.get('member')}")
+        return leader
+
+    def refresh(self):
+        """Re-read the live members and rebalance the ring if they changed (no heartbeat)."""
+        members = self.store.members()
+        if self.member_id not in members:
+            members.append(self.member_id)
+        if sorted(members) != self.ring.members:
+            print(f"🔀 Cluster members changed: {self.ring.members} → {sorted(members)}")
+            self.ring = HashRing(members)
+
+    def sync(self):
+        """Heartbeat, refresh membership (rebalancing the ring) and try to become leader."""
+        self.store.heartbeat(self.member_id)
+        self.refresh()
+        self.is_leader = self._try_lead()
+
+    @contextmanager
+    def actuation(self, title: str):
+        """
+        Exclusive right to change `title`'s VMs (flock per game on the shared volume).
+        Yields True only if no other replica is actuating the game right now and this
+        replica still owns it once the lock is held (membership is re-read under the
+        lock, so a replica with a stale ring backs off instead of racing the new owner).
+        """
+        path = os.path.join(self.store.root, f"actuate-{_hash(title):016x}.lock")
+        with open(path, "a+") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                print(f"🔒 {title} is being actuated by another replica – skipping")
+                yield False
+                return
+            try:
+                self.refresh()
+                owned = self.owns(title)
+                if not owned:
+                    print(f"🔀 {title} moved to {self.ring.owner(title)} – not actuating")
+                yield owned
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def owns(self, title: str) -> bool:
+        return self.ring.owner(title) == self.member_id
+
+    @property
+    def members(self) -> list:
+        return self.ring.members
+
+    def shard_path(self, member: str | None = None) -> str:
+        return os.path.join(self.shard_dir, f"{member or self.member_id}.json")
+
+    def write_shard(self, games: list):
+        """Publish this replica's games for the leader to merge."""
+        tmp = self.shard_path() + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"member": self.member_id, "games": games}, f, indent=2)
+        os.replace(tmp, self.shard_path())
+
+    def merge_shards(self) -> list:
+        """
+        (Leader) Combine the shards of all live members. If a game shows up in two
+        shards (it just moved), the current owner's entry wins.
+        """
+        merged = {}
+        for member in self.members:
+            try:
+                with open(self.shard_path(member)) as f:
+                    games = json.load(f).get("games", [])
+            except (OSError, ValueError):
+                continue
+            for game in games:
+                if game["name"] not in merged or self.ring.owner(game["name"]) == member:
+                    merged[game["name"]] = game
+        return sorted(merged.values(), key=lambda g: g["name"])
+
+    def leave(self):
+        """Give up the lease and leadership (on clean shutdown)."""
+        self.store.release(self.member_id)
+        with self._leader_lock():
+            if self._read_leader().get("member") == self.member_id:
+                os.remove(os.path.join(self.store.root, "leader.json"))
+        self.is_leader = False
@@ -1,4 +1,5 @@
 import os
+import socket
 
 # ==================================================
 # === RUN/TUNING PARAMETERS ===
@@ -9,6 +10,20 @@ HOURLY_PRICE = 1.5
 UPDATE_INTERVAL = 60*2  # sekunder mellom oppdatering av metrics
 DEFAULT_SCALING = "normal"
 MIN_MINUTES_TO_NEXT_HOUR_FOR_SHUTDOWN = 10
+DECISION_WORKERS = 1           # workers for per-spill beslutninger (1 = sekvensielt)
+DECISION_POOL_KIND = "process" # "process" eller "thread"; strategiene er ren Python (GIL), så
+                               # tråder gir ingen speedup – se bench_decisions.py før du øker
+
+# ==================================================
+# === SPIKE / ANOMALY DETECTION (anomaly_detector.py) ===
+# ==================================================
+SPIKE_POLL_INTERVAL = 15          # sekunder mellom ekstra scrapes mellom syklusene
+ANOMALY_EWMA_ALPHA = 0.2          # vekt på nyeste sample i glidende snitt/varians
+ANOMALY_REJECT_Z = 6              # så mange std under snittet → sample forkastes som glitch
+ANOMALY_MAX_REJECTIONS = 3        # etter så mange forkastede på rad godtas nivået som ekte
+ANOMALY_SURGE_Z = 4               # så mange std over snittet → surge
+ANOMALY_SURGE_MIN_RATIO = 0.15    # ... og minst 15 % over snittet
+ANOMALY_WARMUP_SAMPLES = 5        # samples før detektoren begynner å dømme
 
 # ==================================================
 # API / METRICS CONFIG
@@ -40,14 +55,19 @@ OS_APPLICATION_CREDENTIAL_SECRET = "mkWSM2RiqtMINzZjcETtOAS2GFScHo5T6CtxW4cPW6s9
 #     "aggressive" → skaler raskere når kapasiteten begynner å bli full
 #     "passive" → skaler mer konservativt
 #     "normal" → standard opp-/nedskalering
+#     "cost_optimal" → planlegger start/stopp over forecasten slik at betalte timer gjenbrukes
 #
-# - time_offset_hours: (kun predictive) Justerer tidspunktet mot datasettet som er basert på normal dag/time.
+# - time_offset_hours: (kun predictive/cost_optimal) Justerer tidspunktet mot datasettet som er basert på normal dag/time.
 # - lookahead_intervals: (kun predictive) Hvor mange 5-minutters intervaller frem i tid forecasten skal se.
-# - buffer: (kun predictive) Hvor mange spillere som må være ledig på siste VM før systemet skalerer opp.
-# - respect_current_load: (kun predictive/trend) Om algoritmen skal forhindre nedskalering under nåværende behov.
-# - threshold_percent: (kunn trend) Hvor mange prosent av siste VM må være fylt før den skal skalere
+# - buffer: (predictive/cost_optimal m.fl.) Hvor mange spillere som må være ledig på siste VM før systemet skalerer opp.
+# - horizon_hours: (kun cost_optimal) Hvor mange timer frem planen ser (5-minutters slots).
+# - respect_current_load: (kun predictive/trend/cost_optimal) Om algoritmen skal forhindre nedskalering under nåværende behov.
+# - threshold_percent: (kunn trend) Hvor stor andel (0–1, f.eks. 0.8) av siste VM må være fylt før den skal skalere
 # - max_hourly_budget: (valgfritt, funker på alle) Maksimalt hvor mye spillet godtar at serverkostnader kan være per time.
 #
+# Nye strategier registreres med @register_strategy i scaling_algorithms.py. Configen valideres
+# og kompileres til én pipeline per spill ved oppstart (scaling_pipeline.py).
+#
 # Eksempel:
 # Hvis buffer = 75 og det er mindre enn 75 plasser igjen på siste VM → skaler opp.
 # time_offset_hours = -6 → datasettet som brukes til forecasting er 6 timer bak nåværende tid.
@@ -105,12 +125,54 @@ NETWORK_ID = "374240bf-b8c4-45cd-b377-e32a247beb43"    # ⚠️ bruk UUID
 KEYPAIR_NAME = "jorgenkey"                             # SSH Keypair
 SECURITY_GROUP = "default"                             # Standard sikkerhetsgruppe
 
+# ==================================================
+# === CAPACITY PLANNER (bin-packing) ===
+# ==================================================
+# Flavors planleggeren kan pakke game servere på. slots = antall spillere én VM av flavoren tåler.
+# Legg til flere flavors (med ulik kapasitet/pris) her eller i SCALING_CONFIG_FILE.
+FLAVORS = [
+    {"name": "aem.2c4r.50g", "flavor_id": FLAVOR_ID, "slots": PLAYERS_PER_VM, "hourly_price": HOURLY_PRICE},
+]
+PLANNER_HEADROOM_PERCENT = 10       # ledig kapasitet per spill i tillegg til max(nå, forecast)
+MAX_SERVER_SLOTS = PLAYERS_PER_VM   # største enkelt game server (én server kan ikke deles over VMs)
+
+# ==================================================
+# === PER-VM PLAYER TELEMETRY (vm_agent.py) ===
+# ==================================================
+AGENT_PORT = 8080                   # port vm_agent.py lytter på på hver game-VM
+TELEMETRY_TIMEOUT = 2               # sekunder per forespørsel
+TELEMETRY_WORKERS = 16              # samtidige forespørsler / størrelse på connection pool
+DRAIN_BEFORE_DELETE = True          # VMs med spillere tømmes (drain) før de slettes
+DRAIN_TIMEOUT_MINUTES = 15          # slett uansett når draining har vart så lenge
+DRAIN_COST_PER_PLAYER = 0.01        # "kostnad" per spiller som kastes ut, veies mot sparte betalte minutter
+
 # ==================================================
 # === FILE PATHS / LOGGING ===
 # ==================================================
 DATA_DIR = "data"
 OUTPUT_FILE = os.path.join(DATA_DIR, "games.json")
 
+# Hot-reloadable override av PLAYERS_PER_VM, HOURLY_PRICE, MIN_MINUTES_TO_NEXT_HOUR_FOR_SHUTDOWN
+# og scaling-configen over. Filen sjekkes (mtime) før hver syklus – ingen restart nødvendig.
+SCALING_CONFIG_FILE = os.path.join(DATA_DIR, "scaling_config.json")
+
+# Kolonnelager med historikk for hver syklus (spillere, forecast, VMs, kost, fasetider)
+HISTORY_DIR = os.path.join(DATA_DIR, "history")
+
+# Cache for simulate.py: ett resultat per (spill, parametere, last, innstillinger)
+SIM_CACHE_DIR = os.path.join(DATA_DIR, "sim_cache")
+
+# ==================================================
+# === MULTI-MANAGER (cluster.py) ===
+# ==================================================
+# Sett MANAGER_CLUSTER=1 og en unik MANAGER_ID per container for å kjøre flere managere
+# mot samme data-volum. Spillene fordeles mellom replikaene, lederen slår sammen resultatet.
+CLUSTER_ENABLED = os.environ.get("MANAGER_CLUSTER", "0") == "1"
+MANAGER_ID = os.environ.get("MANAGER_ID", socket.gethostname())
+LEASE_DIR = os.path.join(DATA_DIR, "leases")
+SHARD_DIR = os.path.join(DATA_DIR, "shards")
+LEASE_TTL = UPDATE_INTERVAL * 3     # replika regnes som død etter 3 uteblitte sykluser
+
 LOG_DIR = "logs"
 LOG_FILE = os.path.join(LOG_DIR, "vm_changes.log")
 os.makedirs(LOG_DIR, exist_ok=True)
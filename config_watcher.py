@@ -0,0 +1,142 @@
+# config_watcher.py
+import json
+import os
+from typing import NamedTuple
+from config import (
+    SCALING_CONFIG_FILE, PLAYERS_PER_VM, HOURLY_PRICE, MIN_MINUTES_TO_NEXT_HOUR_FOR_SHUTDOWN,
+    GAME_SCALING_CONFIG, DEFAULT_SCALING_CONFIG, FLAVORS, PLANNER_HEADROOM_PERCENT, MAX_SERVER_SLOTS
+)
+from capacity_planner import Flavor, parse_flavors
+from scaling_pipeline import PipelineSet, compile_pipelines
+
+
+class ScalingSettings(NamedTuple):
+    """The hot-reloadable part of the config (see data/scaling_config.json)."""
+    players_per_vm: int
+    hourly_price: float
+    min_minutes_to_next_hour_for_shutdown: float
+    default_scaling_config: dict
+    game_scaling_config: dict
+    flavors: list[Flavor]
+    planner_headroom_percent: float
+    max_server_slots: int
+
+
+def default_settings() -> ScalingSettings:
+    """Settings from the constants in config.py (used when no config file exists)."""
+    return ScalingSettings(
+        players_per_vm=PLAYERS_PER_VM,
+        hourly_price=HOURLY_PRICE,
+        min_minutes_to_next_hour_for_shutdown=MIN_MINUTES_TO_NEXT_HOUR_FOR_SHUTDOWN,
+        default_scaling_config=DEFAULT_SCALING_CONFIG,
+        game_scaling_config=GAME_SCALING_CONFIG,
+        flavors=parse_flavors(FLAVORS),
+        planner_headroom_percent=PLANNER_HEADROOM_PERCENT,
+        max_server_slots=MAX_SERVER_SLOTS,
+    )
+
+
+def parse_settings(raw: dict) -> ScalingSettings:
+    """
+    Build ScalingSettings from a parsed config file.
+    Keys missing from the file keep the config.py value.
+    Raises ValueError on unknown keys or invalid values.
+    """
+    if not isinstance(raw, dict):
+        raise ValueError("config file must contain a JSON object")
+    unknown = set(raw) - set(ScalingSettings._fields)
+    if unknown:
+        raise ValueError(f"unknown config key(s): {', '.join(sorted(unknown))}")
+
+    settings = default_settings()._replace(**raw)
+    if "flavors" in raw:
+        settings = settings._replace(flavors=parse_flavors(raw["flavors"]))
+
+    if not isinstance(settings.players_per_vm, int) or settings.players_per_vm <= 0:
+        raise ValueError("'players_per_vm' must be a positive integer")
+    if not isinstance(settings.hourly_price, (int, float)) or settings.hourly_price <= 0:
+        raise ValueError("'hourly_price' must be a positive number")
+    minutes = settings.min_minutes_to_next_hour_for_shutdown
+    if not isinstance(minutes, (int, float)) or not 0 <= minutes <= 60:
+        raise ValueError("'min_minutes_to_next_hour_for_shutdown' must be between 0 and 60")
+    headroom = settings.planner_headroom_percent
+    if not isinstance(headroom, (int, float)) or headroom < 0:
+        raise ValueError("'planner_headroom_percent' must be a number >= 0")
+    if not isinstance(settings.max_server_slots, int) or settings.max_server_slots <= 0:
+        raise ValueError("'max_server_slots' must be a positive integer")
+    for key in ("default_scaling_config", "game_scaling_config"):
+        if not isinstance(getattr(settings, key), dict):
+            raise ValueError(f"'{key}' must be an object")
+    return settings
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class ConfigWatcher:
+    """
+    Watches the scaling config file (mtime polling) and swaps in new settings
+    and pipelines between cycles. An invalid file is reported and ignored,
+    the last good config stays active.
+    """
+
+    def __init__(self, path: str = SCALING_CONFIG_FILE):
+        self.path = path
+        self._stamp = _file_stamp(path)
+        self._bad_stamp = None
+        settings = self._load() if self._stamp else default_settings()
+        # (settings, pipelines) swappes alltid samlet, så en syklus ser aldri en halv config
+        self.current = (settings, self._compile(settings, None))
+        source = self.path if self._stamp else "config.py"
+        print(f"⚙️ Scaling config loaded from {source}")
+
+    @property
+    def settings(self) -> ScalingSettings:
+        return self.current[0]
+
+    @property
+    def pipelines(self) -> PipelineSet:
+        return self.current[1]
+
+    def _load(self) -> ScalingSettings:
+        with open(self.path, "r") as f:
+            return parse_settings(json.load(f))
+
+    @staticmethod
+    def _compile(settings: ScalingSettings, previous: PipelineSet | None) -> PipelineSet:
+        return compile_pipelines(
+            settings.game_scaling_config,
+            settings.default_scaling_config,
+            hourly_price=settings.hourly_price,
+            players_per_vm=settings.players_per_vm,
+            previous=previous,
+            min_minutes=settings.min_minutes_to_next_hour_for_shutdown,
+        )
+
+    def poll(self) -> bool:
+        """
+        Reload the config if the file changed since last poll.
+        Returns True if a new config was swapped in.
+        """
+        stamp = _file_stamp(self.path)
+        if stamp is None or stamp in (self._stamp, self._bad_stamp):
+            return False
+
+        try:
+            settings = self._load()
+            pipelines = self._compile(settings, self.pipelines)
+        except (OSError, ValueError) as e:  # JSONDecodeError er en ValueError
+            # Ikke oppdater _stamp: en halvskrevet fil blir lest på nytt når den endres igjen
+            self._bad_stamp = stamp
+            print(f"⚠️ Ignoring invalid scaling config {self.path}: {e}")
+            return False
+
+        self._stamp = stamp
+        self.current = (settings, pipelines)
+        print(f"🔄 Scaling config reloaded from {self.path}")
+        return True
@@ -0,0 +1,106 @@
+# decision_pool.py
+import io
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import scaling_algorithms
+from config import DECISION_WORKERS, DECISION_POOL_KIND
+
+
+class _TaskStdout:
+    """
+    sys.stdout stand-in: text printed inside a decision task goes to that task's
+    buffer (per thread), everything else straight to the real stdout.
+    """
+
+    def __init__(self, real):
+        self.real = real
+        self.local = threading.local()
+
+    def write(self, text):
+        buf = getattr(self.local, "buf", None)
+        return (buf if buf is not None else self.real).write(text)
+
+    def flush(self):
+        self.real.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.real, name)
+
+
+def _task_stdout() -> _TaskStdout:
+    if not isinstance(sys.stdout, _TaskStdout):
+        sys.stdout = _TaskStdout(sys.stdout)
+    return sys.stdout
+
+
+def _decide(task):
+    """
+    Run one game's pipeline. Module-level so process workers can unpickle it.
+    The strategy's debug prints and vm_changes.log records are captured and
+    returned instead of written, so the caller can emit them in order.
+    """
+    pipeline, sample = task
+    stdout = _task_stdout()
+    stdout.local.buf = io.StringIO()
+    scaling_algorithms._log_capture.records = records = []
+    try:
+        start = time.perf_counter()
+        vm_count, expected_players = pipeline(sample)
+        seconds = time.perf_counter() - start
+        return vm_count, expected_players, seconds, stdout.local.buf.getvalue(), records
+    finally:
+        stdout.local.buf = None
+        scaling_algorithms._log_capture.records = None
+
+
+class DecisionPool:
+    """
+    Runs the per-game decision stage as one batch on a thread or process pool.
+    Strategies only compute: their prints and vm_changes.log records are collected
+    per game and written by the calling thread afterwards, in input order, so the
+    log never interleaves and the log dedup state (_last_logged) has one owner.
+    Results come back in input order, so the outcome is the same for any worker
+    count. Actuation (OpenStack) is not done here – it stays serialized in the fetch loop.
+    """
+
+    def __init__(self, workers: int = DECISION_WORKERS, kind: str = DECISION_POOL_KIND,
+                 initializer=None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"unknown pool kind '{kind}' (use 'thread' or 'process')")
+        self.workers = max(1, workers)
+        self.kind = kind
+        self._executor = None
+        if self.workers > 1:
+            if kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=initializer)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, initializer=initializer,
+                                                    thread_name_prefix="decide")
+
+    def decide(self, pipelines, samples: list) -> list:
+        """
+        Returns [(vm_count, expected_players, decide_seconds)] in the order of `samples`.
+        """
+        tasks = [(pipelines.get(s.title), s) for s in samples]
+        _task_stdout()  # installeres her (hovedtråden), ikke i workertrådene
+        if self._executor is None:
+            results = [_decide(t) for t in tasks]
+        else:
+            # Større biter for prosesser: hver oppgave må pickles frem og tilbake
+            chunksize = max(1, len(tasks) // (self.workers * 4)) if self.kind == "process" else 1
+            results = list(self._executor.map(_decide, tasks, chunksize=chunksize))
+
+        decisions = []
+        for vm_count, expected_players, seconds, output, records in results:
+            sys.stdout.write(output)
+            for record in records:
+                scaling_algorithms.write_vm_change(*record)
+            decisions.append((vm_count, expected_players, seconds))
+        return decisions
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -1,15 +1,42 @@
 import time
-from config import UPDATE_INTERVAL
+from config import UPDATE_INTERVAL, CLUSTER_ENABLED, SPIKE_POLL_INTERVAL
 from openstack_utils import connect, list_servers, recommend_shutdown
-from metrics_fetcher import fetch_and_write_metrics
+from metrics_fetcher import fetch_and_write_metrics, check_for_spikes
+from config_watcher import ConfigWatcher
+from capacity_planner import CapacityPlanner
+from player_telemetry import TelemetryAggregator
+from timeseries_store import TimeSeriesStore
+from cluster import ClusterMember
+from decision_pool import DecisionPool
+from snapshot_channel import SnapshotPublisher
+from anomaly_detector import SpikeDetector
 
 def main():
     conn = connect()  # connect once at start
+    watcher = ConfigWatcher()  # validate + compile scaling config once at start
+    planner = CapacityPlanner()  # keeps the previous fleet plan between cycles
+    telemetry = TelemetryAggregator()  # per-VM player counts + drain state
+    history = TimeSeriesStore()  # every cycle is appended here
+    cluster = ClusterMember() if CLUSTER_ENABLED else None  # shard games across replicas
+    decision_pool = DecisionPool()  # per-game decisions run as a batch on a worker pool
+    publisher = SnapshotPublisher()  # pushes each cycle to the exporter over a Unix socket
+    detector = SpikeDetector()  # per-game online stats: rejects glitches, flags surges
 
     while True:
-        fetch_and_write_metrics(conn=conn)
+        watcher.poll()  # swap in edited config between cycles (no restart needed)
+        settings, pipelines = watcher.current
+        fetch_and_write_metrics(conn=conn, pipelines=pipelines, settings=settings, planner=planner,
+                                telemetry=telemetry, history=history, cluster=cluster,
+                                decision_pool=decision_pool, publisher=publisher,
+                                detector=detector)
 
-        time.sleep(UPDATE_INTERVAL)
+        # Between cycles: quick scrapes so a surge is scaled up right away
+        next_cycle = time.monotonic() + UPDATE_INTERVAL
+        while (remaining := next_cycle - time.monotonic()) > 0:
+            time.sleep(min(SPIKE_POLL_INTERVAL, remaining))
+            if next_cycle - time.monotonic() > 0:
+                check_for_spikes(conn, pipelines, settings, detector, telemetry=telemetry, cluster=cluster,
+                                 history=history, publisher=publisher)
 
 
 if __name__ == "__main__":
@@ -3,83 +3,206 @@ import re
 import json
 import os
 import time
+from contextlib import nullcontext
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
-from scaling_algorithms import get_scaling_function, get_expected_players
-from openstack_utils import connect, list_servers, start_vms, stop_vms, count_vms
+from scaling_algorithms import GameSample
+from scaling_pipeline import PipelineSet
+from config_watcher import ScalingSettings, ConfigWatcher
+from capacity_planner import CapacityPlanner, game_demand
+from player_telemetry import TelemetryAggregator
+from timeseries_store import TimeSeriesStore
+from cluster import ClusterMember
+from decision_pool import DecisionPool
+from snapshot_channel import SnapshotPublisher
+from anomaly_detector import SpikeDetector, SURGE
+from openstack_utils import (
+    connect, list_servers, start_vms, stop_vms, count_vms, finish_drained_vms, billing_minutes
+)
 from config import (
     API_URL, FILTER_FIELD, FILTER_VALUE, UPDATE_INTERVAL,
-    DATA_DIR, OUTPUT_FILE, GAME_SCALING_CONFIG, DEFAULT_SCALING_CONFIG,
-    HOURLY_PRICE, TARGET_GAME
+    DATA_DIR, OUTPUT_FILE, TARGET_GAME
 )
 
 
 # Make sure data folder exists
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# In-memory state between cycles (games.json is only read on a cold start)
+_previous_games = {}
+_decisions_total = {}  # game → {"scale_up"/"scale_down"/"hold": count}
+_last_snapshot = None  # siste snapshot sendt til exporteren (oppdateres ved out-of-band skalering)
+
+
+def load_games(path: str) -> dict:
+    """Games from a games.json-style file, keyed by name ({} if missing/corrupt)."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        try:
+            return {g["name"]: g for g in json.load(f).get("games", [])}
+        except json.JSONDecodeError:
+            return {}
+
+
+
+def parse_player_counts(lines):
+    """Yield (title, player_count) for every metric line matching our filter."""
+    for line in lines:
+        # Only include metrics for our chosen developer/filter
+        if f'{FILTER_FIELD}="{FILTER_VALUE}"' not in line:
+            continue
+
+        # Extract game title and player count using regex
+        title_match = re.search(r'title="([^"]+)"', line)
+        count_match = re.search(r'\s(\d+)$', line)
+        if not (title_match and count_match):
+            continue
+
+        yield title_match.group(1), int(count_match.group(1))
+
 
+def _actuation(cluster: ClusterMember | None, title: str):
+    """Per-game actuation lock in a cluster (yields False → leave the VMs alone this time)."""
+    return cluster.actuation(title) if cluster is not None else nullcontext(True)
 
-def enforce_hourly_budget(vm_count: int, hourly_price: float, max_budget: float | None) -> int:
+
+def _billing_clocks(conn, pipelines: PipelineSet, title: str, settings: ScalingSettings,
+                    telemetry: TelemetryAggregator | None = None) -> tuple:
     """
-    Checks if the VM count exceeds the hourly budget.
-    If it does, returns the maximum VMs allowed within the budget.
-    If no budget is set (None), returns the original vm_count.
+    Minutes left of each running VM's paid hour, for strategies that plan against billing.
+    Only the target game has real VMs; other games get () (treated as already expired).
     """
-    if max_budget is None:
-        return vm_count
-    max_vms = max(1, int(max_budget // hourly_price))  # ensure at least 1 VM
-    if vm_count > max_vms:
-        print(f"⚠️ Hourly budget exceeded: {vm_count * hourly_price:.2f} > {max_budget:.2f}, "
-              f"limiting to {max_vms} VM(s).")
-        return max_vms
-    return vm_count
+    if title != TARGET_GAME or conn is None or "billing_minutes" not in pipelines.get(title).state:
+        return ()
+    return billing_minutes(conn, settings.hourly_price,
+                           exclude=telemetry.draining if telemetry is not None else ())
 
 
-def fetch_and_write_metrics(conn):
+def actuate_target_game(conn, vm_count: int, settings: ScalingSettings,
+                        telemetry: TelemetryAggregator | None = None):
+    """
+    Bring the target game's OpenStack VMs to `vm_count`.
+    Returns (actual vm count, VM info for JSON).
+    """
+    if conn is None:
+        raise ValueError("OpenStack connection required for target game management")
+
+    # Delete VMs that finished draining; draining VMs no longer count as capacity
+    if telemetry is not None:
+        drained = finish_drained_vms(conn, telemetry, settings.hourly_price)
+        if drained:
+            print(f"✅ Deleted drained VMs: {drained}")
+
+    # Get current VMs for this game
+    current_vm_count = count_vms(conn)
+    if telemetry is not None:
+        current_vm_count -= len(telemetry.draining)
+
+    # Determine how many VMs to start or stop
+    delta_vms = int(vm_count) - int(current_vm_count)
+
+    if delta_vms > 0 and telemetry is not None and telemetry.draining:
+        # Scale up by taking draining VMs back into use first
+        for vm in list_servers(conn, settings.hourly_price):
+            if delta_vms > 0 and telemetry.cancel_drain(vm):
+                delta_vms -= 1
+
+    if delta_vms > 0:
+        # Scale up
+        print(f"🟢 Scaling up: starting {delta_vms} VMs...")
+        started = start_vms(conn, delta_vms, base_name=TARGET_GAME.replace(" ", ""))
+        print(f"✅ Started VMs: {started}")
+
+    elif delta_vms < 0:
+        # Scale down
+        to_stop = abs(delta_vms)
+        print(f"🔴 Scaling down: stopping {to_stop} VMs...")
+        stopped = stop_vms(conn, to_stop, settings.min_minutes_to_next_hour_for_shutdown,
+                           telemetry=telemetry, hourly_price=settings.hourly_price)
+        print(f"✅ Stopped VMs: {stopped}")
+
+    # Refresh VMs info after scaling
+    all_vms = list_servers(conn, settings.hourly_price)
+    game_vms = [vm for vm in all_vms if "manager" not in vm["name"].lower()]
+    vm_players = telemetry.poll(game_vms) if telemetry is not None else {}
+    draining = telemetry.draining if telemetry is not None else {}
+
+    # Collect VM info for JSON
+    vms_info = [
+        {
+            "name": vm["name"],
+            "status": vm["status"],
+            "uptime": str(vm["uptime"]).split(".")[0] if vm.get("uptime") else None,
+            "paid_hours": vm.get("paid_hours", 0),
+            "cost": vm.get("cost", 0),
+            "players": vm_players.get(vm["name"]),
+            "draining": vm["name"] in draining
+        }
+        for vm in game_vms
+    ]
+    # Draining VMs are on their way out and are not capacity
+    return len(game_vms) - sum(vm["name"] in draining for vm in game_vms), vms_info
+
+
+def fetch_and_write_metrics(conn, pipelines: PipelineSet | None = None,
+                            settings: ScalingSettings | None = None,
+                            planner: CapacityPlanner | None = None,
+                            telemetry: TelemetryAggregator | None = None,
+                            history: TimeSeriesStore | None = None,
+                            cluster: ClusterMember | None = None,
+                            decision_pool: DecisionPool | None = None,
+                            publisher: SnapshotPublisher | None = None,
+                            detector: SpikeDetector | None = None):
+    # Pipelines/settings come from main's ConfigWatcher; load them here only for ad-hoc calls
+    if pipelines is None or settings is None:
+        watcher = ConfigWatcher()
+        pipelines, settings = watcher.pipelines, watcher.settings
+
+    global _previous_games, _last_snapshot
+
     # 🕓 Record when this run started
     start_time = datetime.now(ZoneInfo("Europe/Oslo"))
+    cycle_start = time.perf_counter()
 
     # =========================================================
-    # STEP 1 — Load existing JSON data (previous state)
+    # STEP 1 — Previous state (in memory; from JSON on cold start)
     # =========================================================
-    if os.path.exists(OUTPUT_FILE):
-        with open(OUTPUT_FILE, "r") as f:
-            try:
-                old_data = json.load(f)
-                # Convert games into a dictionary by name for easy lookup
-                old_games = {g["name"]: g for g in old_data.get("games", [])}
-            except json.JSONDecodeError:
-                old_games = {}
+    if cluster is None and _previous_games:
+        old_games = _previous_games
     else:
-        old_games = {}
+        old_games = load_games(OUTPUT_FILE)
+    if cluster is not None:
+        # Vår egen shard er ferskere enn lederens sammenslåtte fil
+        cluster.sync()
+        old_games.update(load_games(cluster.shard_path()))
+        old_games.update(_previous_games)  # inkl. eventuelle out-of-band oppskaleringer
 
     # =========================================================
     # STEP 2 — Fetch current metrics from API
     # =========================================================
+    phase_start = time.perf_counter()
     response = requests.get(API_URL)
     lines = response.text.splitlines()  # each line = 1 metric
-    games = []                          # will hold all updated game data
+    fetch_s = time.perf_counter() - phase_start
+
     any_changed = False                 # track if anything actually changed
 
     # =========================================================
-    # STEP 3 — Parse each metric line
+    # STEP 3 — Parse each metric line into a GameSample
     # =========================================================
-    for line in lines:
-        # Only include metrics for our chosen developer/filter
-        if f'{FILTER_FIELD}="{FILTER_VALUE}"' not in line:
+    samples = []
+    for title, player_count in parse_player_counts(lines):
+        # In a cluster, other replicas handle the games they own
+        if cluster is not None and not cluster.owns(title):
             continue
 
-        # Extract game title and player count using regex
-        title_match = re.search(r'title="([^"]+)"', line)
-        count_match = re.search(r'\s(\d+)$', line)
-        if not (title_match and count_match):
-            continue
-
-        title = title_match.group(1)
-        player_count = int(count_match.group(1))
-
-        # If player_count == 0, use previous value (to prevent resets)
-        if player_count == 0 and title in old_games:
+        if detector is not None:
+            # Reject glitches (0, sudden collapses) – the last good value is used instead
+            player_count, _ = detector.observe(title, player_count,
+                                               fallback=old_games.get(title, {}).get("player_count"))
+        elif player_count == 0 and title in old_games:
+            # If player_count == 0, use previous value (to prevent resets)
             player_count = old_games[title].get("player_count", 0)
 
         previous_count = old_games.get(title, {}).get("player_count", 0)
@@ -88,142 +211,249 @@ def fetch_and_write_metrics(conn):
         if player_count != previous_count:
             any_changed = True
 
-        # =========================================================
-        # STEP 4 — Determine which scaling strategy to use
-        # =========================================================
-        game_conf = GAME_SCALING_CONFIG.get(title, DEFAULT_SCALING_CONFIG)
-
-        strategy = game_conf.get("strategy", DEFAULT_SCALING_CONFIG["strategy"])
-        time_offset_hours = game_conf.get("time_offset_hours", DEFAULT_SCALING_CONFIG["time_offset_hours"])
-        lookahead_intervals = game_conf.get("lookahead_intervals", DEFAULT_SCALING_CONFIG["lookahead_intervals"])
-        buffer = game_conf.get("buffer", DEFAULT_SCALING_CONFIG["buffer"])
-        respect_current_load = game_conf.get("respect_current_load", False)  # 👈 nytt
-
-
-        scaling_func = get_scaling_function(strategy)
-        
-        corrected_future = None  # used only for predictive
-
-        # ---------------------------------------------------------
-        # 🧠 PREDICTIVE — Uses expected player forecast + deviation
-        # ---------------------------------------------------------
-        if strategy == "predictive":
-            now = datetime.now(ZoneInfo("Europe/Oslo"))
-            current_day = now.strftime("%A").lower()
-            current_hour = f"{now.hour:02d}"
-            current_minute = f"{(now.minute // 5) * 5:02d}"
-            current_vms = old_games.get(title, {}).get("vm_count", 1)
-
-            # scaling_func = calculate_predictive_scaling(...)
-            vm_count, corrected_future, _ = scaling_func(
-                current_day, current_hour, current_minute,
-                player_count, current_vms, buffer=buffer,  respect_current_load=respect_current_load,
-            )
-
-        # ---------------------------------------------------------
-        # 📈 TREND — Reacts to recent change in player count
-        # ---------------------------------------------------------
-        elif strategy == "trend":
-            current_vms = old_games.get(title, {}).get("vm_count", 1)
-
-            vm_count = scaling_func(
-                current_count=player_count,
-                previous_count=previous_count,
-                current_vms=current_vms,
-                threshold_percent=game_conf.get("threshold_percent", 95.0),  # 👈 fetch from config
-                respect_current_load=respect_current_load,
-            )
-
-
-
-        # ---------------------------------------------------------
-        # ⚙️ NORMAL / PASSIVE / AGGRESSIVE — Static threshold rules
-        # ---------------------------------------------------------
-        else:
-            vm_count = scaling_func(player_count) + buffer
-
-        # =========================================================
-        # STEP 5 — Calculate costs for this game
-        # =========================================================
-        max_budget = game_conf.get("max_hourly_budget", None)
-        vm_count = enforce_hourly_budget(vm_count, HOURLY_PRICE, max_budget)
-        hourly_cost = HOURLY_PRICE * vm_count
+        samples.append(GameSample(
+            title=title,
+            player_count=player_count,
+            previous_count=previous_count,
+            current_vms=old_games.get(title, {}).get("vm_count", 1),
+            now=start_time,
+            billing_minutes=_billing_clocks(conn, pipelines, title, settings, telemetry),
+        ))
+
+    # =========================================================
+    # STEP 4 — Run every game's compiled scaling pipeline as one batch
+    #          (strategy → budget cap → stabilizer)
+    # =========================================================
+    if decision_pool is None:
+        decision_pool = DecisionPool(workers=1)
+    phase_start = time.perf_counter()
+    decisions = decision_pool.decide(pipelines, samples)
+    decide_s = time.perf_counter() - phase_start
+
+    # =========================================================
+    # STEP 5 — Actuate + build JSON entries (serialized, in scrape order)
+    # =========================================================
+    games = []                          # will hold all updated game data
+    game_timings = {}                   # per-game decide/actuate seconds
+    for sample, (vm_count, expected_players, game_decide_s) in zip(samples, decisions):
+        title = sample.title
+
+        decision = ("scale_up" if vm_count > sample.current_vms
+                    else "scale_down" if vm_count < sample.current_vms else "hold")
+        counts = _decisions_total.setdefault(title, {"scale_up": 0, "scale_down": 0, "hold": 0})
+        counts[decision] += 1
+
+        # Calculate costs for this game
+        hourly_cost = settings.hourly_price * vm_count
         daily_cost = hourly_cost * 24
 
-        # =========================================================
-        # STEP 6 — Manage actual OpenStack VMs (for target game only)
-        # =========================================================
+        # Manage actual OpenStack VMs (for target game only)
+        phase_start = time.perf_counter()
+        vms_info = []
         if title == TARGET_GAME:
-            if conn is None:
-                raise ValueError("OpenStack connection required for target game management")
-
-            # Get current VMs for this game
-            current_vm_count = count_vms(conn)
-
-            # Determine how many VMs to start or stop
-            delta_vms = int(vm_count) - int(current_vm_count)
-
-            if delta_vms > 0:
-                # Scale up
-                print(f"🟢 Scaling up: starting {delta_vms} VMs...")
-                started = start_vms(conn, delta_vms, base_name=TARGET_GAME.replace(" ", ""))
-                print(f"✅ Started VMs: {started}")
-
-            elif delta_vms < 0:
-                # Scale down
-                to_stop = abs(delta_vms)
-                print(f"🔴 Scaling down: stopping {to_stop} VMs...")
-                stopped = stop_vms(conn, to_stop)
-                print(f"✅ Stopped VMs: {stopped}")
-
-            # Refresh VMs info after scaling
-            all_vms = list_servers(conn)
-            game_vms = [vm for vm in all_vms if "manager" not in vm["name"].lower()]
-            vm_count = len(game_vms)
-
-            # Collect VM info for JSON
-            vms_info = [
-                {
-                    "name": vm["name"],
-                    "status": vm["status"],
-                    "uptime": str(vm["uptime"]).split(".")[0] if vm.get("uptime") else None,
-                    "paid_hours": vm.get("paid_hours", 0),
-                    "cost": vm.get("cost", 0)
-                }
-                for vm in game_vms
-            ]
-
-
-        # =========================================================
-        # STEP 7 — Build entry for JSON output
-        # =========================================================
+            with _actuation(cluster, title) as allowed:
+                if allowed:
+                    vm_count, vms_info = actuate_target_game(conn, vm_count, settings, telemetry)
+                else:
+                    vm_count = sample.current_vms
+                    vms_info = old_games.get(title, {}).get("vms", [])
+        game_timings[title] = (game_decide_s, time.perf_counter() - phase_start)
+
         games.append({
             "name": title,
             "developer": FILTER_VALUE,
-            "player_count": player_count,
-            "expected_players": corrected_future if strategy == "predictive" else None,
+            "player_count": sample.player_count,
+            "expected_players": expected_players,
             "vm_count": vm_count,
-            "scaling_strategy": strategy,
+            "scaling_strategy": pipelines.get(title).strategy,
             "vms": vms_info,
             "hourly_cost": hourly_cost,
             "daily_cost": daily_cost,
-            "last_updated": start_time.isoformat() + "Z"
+            "last_updated": start_time.isoformat()
         })
 
+    # =========================================================
+    # STEP 6 — In a cluster: publish our shard, leader merges all shards
+    # =========================================================
+    all_games = games
+    if cluster is not None:
+        cluster.write_shard(games)
+        if cluster.is_leader:
+            all_games = cluster.merge_shards()
+            any_changed = True
+            print(f"👑 Merged {len(all_games)} games from {len(cluster.members)} replica(s)")
+        else:
+            all_games = None  # lederen skriver games.json og planlegger flåten
+
+    # =========================================================
+    # STEP 7 — Pack all games onto a shared, mixed-flavor fleet
+    # =========================================================
+    phase_start = time.perf_counter()
+    fleet = None
+    if planner is not None and all_games:
+        demands = {
+            g["name"]: game_demand(g["player_count"], g["expected_players"],
+                                   settings.planner_headroom_percent)
+            for g in all_games
+        }
+        plan = planner.plan(demands, settings.flavors, settings.max_server_slots)
+        fleet = plan.to_json()
+        per_game_cost = sum(g["hourly_cost"] for g in all_games)
+        print(f"\n📦 Fleet plan: {len(plan.vms)} VM(s), {plan.hourly_cost:.2f}/h "
+              f"(én-VM-per-spill: {per_game_cost:.2f}/h), {len(plan.moves)} move(s)")
+
+    plan_s = time.perf_counter() - phase_start
+
     # =========================================================
     # STEP 8 — Write new data to JSON if something changed
     # =========================================================
-    if any_changed:
-        data = {"games": games}
+    phase_start = time.perf_counter()
+    if all_games is None:
+        print(f"\nℹ️ Shard for {cluster.member_id} skrevet – lederen oppdaterer {OUTPUT_FILE}")
+    elif any_changed:
+        data = {"games": all_games}
+        if fleet is not None:
+            data["fleet"] = fleet
         with open(OUTPUT_FILE, "w") as f:
             json.dump(data, f, indent=2)
         print(f"\n✅ Oppdatert alle spill i {OUTPUT_FILE}")
     else:
         print("\nℹ️ Ingen endringer – beholdt eksisterende fil uendret")
+    write_s = time.perf_counter() - phase_start
+    _previous_games = {g["name"]: g for g in games}
+
+    # =========================================================
+    # STEP 9 — Push the snapshot to the exporter (no file polling)
+    # =========================================================
+    if publisher is not None and all_games is not None:
+        actuate_s = sum(t[1] for t in game_timings.values())
+        snapshot = {"games": all_games, "cycle": {
+            "started_at": start_time.isoformat(),
+            "timestamp": start_time.timestamp(),
+            "phases": {
+                "fetch": fetch_s,
+                "decide": decide_s,
+                "actuate": actuate_s,
+                "plan": plan_s,
+                "write": write_s,
+                "total": time.perf_counter() - cycle_start,
+            },
+            "decisions_total": _decisions_total,
+        }}
+        if fleet is not None:
+            snapshot["fleet"] = fleet
+        publisher.publish(snapshot)
+        _last_snapshot = snapshot
 
     # =========================================================
-    # STEP 9 — Print next scheduled update
+    # STEP 10 — Append this cycle to the time-series history
+    # =========================================================
+    if history is not None:
+        ts = start_time.timestamp()
+        history.append_cycle({
+            g["name"]: {
+                "ts": ts,
+                "player_count": g["player_count"],
+                "expected_players": g["expected_players"],
+                "vm_count": g["vm_count"],
+                "hourly_cost": g["hourly_cost"],
+                "fetch_s": fetch_s,
+                "decide_s": game_timings[g["name"]][0],
+                "actuate_s": game_timings[g["name"]][1],
+                "plan_s": plan_s,
+                "write_s": write_s,
+            }
+            for g in games
+        })
+
+    # =========================================================
+    # STEP 11 — Print next scheduled update
     # =========================================================
     next_run = start_time + timedelta(seconds=UPDATE_INTERVAL)
     print(f"\n✅ Wrote {len(games)} games to {OUTPUT_FILE}")
     print(f"⏱ Neste oppdatering klokken {next_run.strftime('%Y-%m-%d %H:%M:%S')} (Norsk tid)")
+
+
+def check_for_spikes(conn, pipelines: PipelineSet, settings: ScalingSettings, detector: SpikeDetector,
+                     telemetry: TelemetryAggregator | None = None,
+                     cluster: ClusterMember | None = None,
+                     history: TimeSeriesStore | None = None,
+                     publisher: SnapshotPublisher | None = None) -> list:
+    """
+    Quick scrape between regular cycles. Games whose player count surges are
+    scaled up immediately (never down – that waits for the next cycle), and the
+    change is recorded in history and pushed to the exporter right away.
+    Returns the titles that were scaled out-of-band.
+    """
+    global _last_snapshot
+    try:
+        response = requests.get(API_URL, timeout=10)
+    except requests.RequestException as e:
+        print(f"⚠️ Spike check scrape failed: {e}")
+        return []
+
+    now = datetime.now(ZoneInfo("Europe/Oslo"))
+    if cluster is not None:
+        cluster.refresh()  # ringen fra forrige syklus kan være opptil et helt intervall gammel
+    scaled = []
+    for title, player_count in parse_player_counts(response.text.splitlines()):
+        if cluster is not None and not cluster.owns(title):
+            continue
+        previous = _previous_games.get(title)
+        player_count, verdict = detector.observe(
+            title, player_count, fallback=previous.get("player_count") if previous else None)
+        if verdict != SURGE or previous is None:
+            continue
+
+        current_vms = previous.get("vm_count", 1)
+        sample = GameSample(title, player_count, previous.get("player_count", 0), current_vms, now,
+                            _billing_clocks(conn, pipelines, title, settings, telemetry))
+        vm_count, expected_players = pipelines.get(title)(sample)
+        if vm_count <= current_vms:
+            continue
+
+        print(f"🚨 Out-of-band scale-up for {title}: {current_vms} → {vm_count} VMs")
+        vms_info = previous.get("vms", [])
+        if title == TARGET_GAME:
+            with _actuation(cluster, title) as allowed:
+                if not allowed:
+                    continue
+                vm_count, vms_info = actuate_target_game(conn, vm_count, settings, telemetry)
+
+        hourly_cost = settings.hourly_price * vm_count
+        _previous_games[title] = dict(
+            previous, player_count=player_count, expected_players=expected_players,
+            vm_count=vm_count, vms=vms_info, hourly_cost=hourly_cost, daily_cost=hourly_cost * 24,
+            last_updated=now.isoformat(),
+        )
+        counts = _decisions_total.setdefault(title, {"scale_up": 0, "scale_down": 0, "hold": 0})
+        counts["scale_up"] += 1
+        scaled.append(title)
+
+    if not scaled:
+        return scaled
+
+    # Dashboards skal se oppskaleringen nå, ikke først ved neste syklus
+    if cluster is not None:
+        cluster.write_shard(list(_previous_games.values()))
+    if history is not None:
+        history.append_cycle({
+            title: {
+                "ts": now.timestamp(),
+                "player_count": _previous_games[title]["player_count"],
+                "expected_players": _previous_games[title]["expected_players"],
+                "vm_count": _previous_games[title]["vm_count"],
+                "hourly_cost": _previous_games[title]["hourly_cost"],
+            }
+            for title in scaled
+        })
+    if publisher is not None and _last_snapshot is not None:
+        games = [_previous_games.get(g["name"], g) for g in _last_snapshot["games"]]
+        snapshot = dict(_last_snapshot, games=games, out_of_band={
+            "timestamp": now.timestamp(),
+            "titles": scaled,
+        })
+        snapshot["cycle"] = dict(snapshot["cycle"], decisions_total=_decisions_total)
+        publisher.publish(snapshot)
+        _last_snapshot = snapshot
+    return scaled
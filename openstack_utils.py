@@ -8,7 +8,8 @@ from config import (
     HOURLY_PRICE, IMAGE_ID, FLAVOR_ID, NETWORK_ID,
     KEYPAIR_NAME, SECURITY_GROUP,
     OS_AUTH_TYPE, OS_AUTH_URL, OS_APPLICATION_CREDENTIAL_ID,
-    OS_APPLICATION_CREDENTIAL_SECRET, OS_REGION_NAME, OS_INTERFACE, MIN_MINUTES_TO_NEXT_HOUR_FOR_SHUTDOWN
+    OS_APPLICATION_CREDENTIAL_SECRET, OS_REGION_NAME, OS_INTERFACE, MIN_MINUTES_TO_NEXT_HOUR_FOR_SHUTDOWN,
+    DRAIN_BEFORE_DELETE, DRAIN_COST_PER_PLAYER
 )
 
 
@@ -31,11 +32,21 @@ def connect():
         return None
 
 
-def list_servers(conn):
+def server_address(server):
+    """First fixed IP of a server (used to reach its vm_agent), or None."""
+    for addrs in (server.addresses or {}).values():
+        for a in addrs:
+            if a.get("OS-EXT-IPS:type", "fixed") == "fixed" and a.get("addr"):
+                return a["addr"]
+    return None
+
+
+def list_servers(conn, hourly_price: float = HOURLY_PRICE):
     """
     List all VMs excluding manager and return info:
     - name
     - status
+    - address
     - launched_at
     - uptime (timedelta)
     - paid_hours
@@ -51,6 +62,7 @@ def list_servers(conn):
             servers_info.append({
                 "name": server.name,
                 "status": server.status,
+                "address": server_address(server),
                 "launched_at": None,
                 "uptime": None,
                 "paid_hours": 0,
@@ -66,6 +78,7 @@ def list_servers(conn):
             servers_info.append({
                 "name": server.name,
                 "status": server.status,
+                "address": server_address(server),
                 "launched_at": None,
                 "uptime": None,
                 "paid_hours": 0,
@@ -75,11 +88,12 @@ def list_servers(conn):
 
         uptime = datetime.now(timezone.utc) - started_at
         paid_hours = math.ceil(uptime.total_seconds() / 3600)
-        cost = paid_hours * HOURLY_PRICE
+        cost = paid_hours * hourly_price
 
         servers_info.append({
             "name": server.name,
             "status": server.status,
+            "address": server_address(server),
             "launched_at": started_at,
             "uptime": uptime,
             "paid_hours": paid_hours,
@@ -89,12 +103,30 @@ def list_servers(conn):
     return servers_info
 
 
-def recommend_shutdown(servers_info):
+def billing_minutes(conn, hourly_price: float = HOURLY_PRICE, exclude=()) -> tuple:
+    """
+    Minutes left of the current paid hour for each running game VM (for cost_optimal).
+    VMs named in `exclude` (e.g. draining) and VMs without a start time are skipped.
     """
-    Return VMs sorted by who is closest to next full hour.
-    Marks which VMs are eligible for shutdown.
+    minutes = []
+    for vm in list_servers(conn, hourly_price):
+        if "manager" in vm["name"].lower() or vm["name"] in exclude or not vm["uptime"]:
+            continue
+        minutes.append(60 - (vm["uptime"].total_seconds() / 60) % 60)
+    return tuple(minutes)
+
+
+def recommend_shutdown(servers_info, min_minutes: float = MIN_MINUTES_TO_NEXT_HOUR_FOR_SHUTDOWN,
+                       players: dict | None = None, hourly_price: float = HOURLY_PRICE,
+                       drain_cost_per_player: float = DRAIN_COST_PER_PLAYER):
+    """
+    Return VMs sorted by cheapest to shut down.
+    Marks which VMs are eligible for shutdown (close to the next billed hour).
+    With per-VM player counts, the paid minutes thrown away are weighed against
+    the players that must be drained; without them this is plain billing order.
     Prints debug info showing uptime and recommendation.
     """
+    players = players or {}
 
     recommendations = []
     for s in servers_info:
@@ -103,28 +135,39 @@ def recommend_shutdown(servers_info):
         total_minutes = s["uptime"].total_seconds() / 60
         minutes_past_hour = total_minutes % 60
         minutes_to_next_hour = 60 - minutes_past_hour
-        can_shutdown = minutes_to_next_hour <= MIN_MINUTES_TO_NEXT_HOUR_FOR_SHUTDOWN
+        can_shutdown = minutes_to_next_hour <= min_minutes
+
+        vm_players = players.get(s["name"])
+        wasted_paid = hourly_price * minutes_to_next_hour / 60
+        drain_cost = drain_cost_per_player * (vm_players or 0)
 
         recommendations.append({
             "name": s["name"],
+            "address": s.get("address"),
             "uptime": s["uptime"],
             "minutes_to_next_hour": minutes_to_next_hour,
             "minutes_past_hour": minutes_past_hour,
+            "players": vm_players,
+            "shutdown_cost": wasted_paid + drain_cost,
             "recommend_shutdown": can_shutdown
         })
 
-    # Sort by minutes to next hour (ascending)
-    recommendations.sort(key=lambda x: x["minutes_to_next_hour"])
+    # Sort by total cost of shutting down (ascending); ties → closest to next hour.
+    # Unknown player count (agent not answering) goes last – it may be a full VM.
+    recommendations.sort(key=lambda x: (bool(players) and x["players"] is None,
+                                        x["shutdown_cost"], x["minutes_to_next_hour"]))
 
     # --- DEBUG PRINT ---
     print("\n🛠 Shutdown recommendations (for debugging, not deleting):")
-    print(f"{'VM Name':25} {'Uptime':20} {'Past min':10} {'To next hour':13} {'Shutdown?':10}")
-    print("-" * 85)
+    print(f"{'VM Name':25} {'Uptime':20} {'Past min':10} {'To next hour':13} {'Players':8} {'Cost':7} {'Shutdown?':10}")
+    print("-" * 101)
     for r in recommendations:
         uptime_str = str(r["uptime"]).split(".")[0]
         shutdown_str = "YES" if r["recommend_shutdown"] else "NO"
-        print(f"{r['name']:25} {uptime_str:20} {r['minutes_past_hour']:10.0f} {r['minutes_to_next_hour']:13.0f} {shutdown_str:>10}")
-    print("-" * 85)
+        players_str = "?" if r["players"] is None else str(r["players"])
+        print(f"{r['name']:25} {uptime_str:20} {r['minutes_past_hour']:10.0f} {r['minutes_to_next_hour']:13.0f} "
+              f"{players_str:>8} {r['shutdown_cost']:7.2f} {shutdown_str:>10}")
+    print("-" * 101)
 
     return recommendations
 
@@ -159,19 +202,79 @@ def start_vms(conn, count, base_name="GameVM"):
     return started
 
 
-def stop_vms(conn, count):
+def delete_vm(conn, name):
+    """
+    Delete one VM by name and wait until it is gone.
+    Never deletes manager VM. Returns True if the VM was deleted.
+    """
+    server = conn.compute.find_server(name)
+    if not server:
+        print(f"⚠️ VM '{name}' not found, skipping")
+        return False
+
+    if "manager" in server.name.lower():
+        print(f"⚙️ Skipping manager VM '{name}'")
+        return False
+
+    try:
+        print(f"🗑 Deleting VM '{name}'...")
+        conn.compute.delete_server(server)
+        # Wait until server disappears
+        for _ in range(60):  # max 5 minutes
+            if not conn.compute.find_server(name):
+                print(f"✅ VM '{name}' deleted")
+                return True
+            time.sleep(5)
+        print(f"⚠️ Timeout waiting for VM '{name}' to be deleted")
+    except Exception as e:
+        print(f"❌ Failed to delete VM '{name}': {e}")
+    return False
+
+
+def finish_drained_vms(conn, telemetry, hourly_price: float = HOURLY_PRICE):
+    """
+    Delete draining VMs that are empty (or whose drain timed out).
+    All game VMs are polled, so drains started before a manager restart are found too.
+    Returns list of deleted VM names.
+    """
+    game_vms = [vm for vm in list_servers(conn, hourly_price) if "manager" not in vm["name"].lower()]
+    players = telemetry.poll(game_vms)
+
+    # VMs som er borte fra OpenStack trenger vi ikke følge med på lenger
+    for name in list(telemetry.draining):
+        if name not in players:
+            telemetry.forget(name)
+
+    deleted = []
+    for name in telemetry.drained(players):
+        if delete_vm(conn, name):
+            deleted.append(name)
+            telemetry.forget(name)
+    return deleted
+
+
+def stop_vms(conn, count, min_minutes: float = MIN_MINUTES_TO_NEXT_HOUR_FOR_SHUTDOWN,
+             telemetry=None, hourly_price: float = HOURLY_PRICE, drain: bool = DRAIN_BEFORE_DELETE):
     """
     Delete up to `count` VMs using recommendations.
+    With a TelemetryAggregator, victims are chosen by billing savings vs. players
+    on the VM, and (if `drain`) only VMs known to be empty are deleted: the rest
+    are drained, or skipped if the drain fails, and finish_drained_vms deletes
+    them on a later cycle once empty.
     Never deletes manager VM.
     Returns list of deleted VM names.
     """
 
-    all_vms = list_servers(conn)
+    all_vms = list_servers(conn, hourly_price)
     game_vms = [vm for vm in all_vms if "manager" not in vm["name"].lower()]
     if not game_vms or count <= 0:
         return []
 
-    recs = recommend_shutdown(game_vms)
+    draining = telemetry.draining if telemetry is not None else {}
+    game_vms = [vm for vm in game_vms if vm["name"] not in draining]
+    players = telemetry.poll(game_vms) if telemetry is not None else {}
+
+    recs = recommend_shutdown(game_vms, min_minutes, players, hourly_price)
     candidates = [r for r in recs if r["recommend_shutdown"]]
     print(f"🛠 VMs recommended for deletion: {[r['name'] for r in candidates]}")
 
@@ -179,34 +282,22 @@ def stop_vms(conn, count):
         print("ℹ️ No VMs eligible for deletion")
         return []
 
-    to_delete = candidates[:count]
     deleted = []
-
-    for r in to_delete:
-        name = r["name"]
-        server = conn.compute.find_server(name)
-        if not server:
-            print(f"⚠️ VM '{name}' not found, skipping")
-            continue
-
-        if "manager" in server.name.lower():
-            print(f"⚙️ Skipping manager VM '{name}'")
-            continue
-
-        try:
-            print(f"🗑 Deleting VM '{name}'...")
-            conn.compute.delete_server(server)
-            # Wait until server disappears
-            for _ in range(60):  # max 5 minutes
-                if not conn.compute.find_server(name):
-                    print(f"✅ VM '{name}' deleted")
-                    deleted.append(name)
-                    break
-                time.sleep(5)
+    handled = 0  # slettet eller satt til drain
+    for r in candidates:
+        if handled >= count:
+            break
+        # Ukjent antall (None) behandles som "har spillere" → drain, aldri slett.
+        # Feiler drain (ingen adresse / agenten svarer ikke) hoppes VMen over.
+        if drain and telemetry is not None and r["players"] != 0:
+            if telemetry.drain(r):
+                handled += 1
             else:
-                print(f"⚠️ Timeout waiting for VM '{name}' to be deleted")
-        except Exception as e:
-            print(f"❌ Failed to delete VM '{name}': {e}")
+                print(f"⚠️ Could not drain '{r['name']}' (players: {r['players']}) – not deleting it")
+            continue
+        if delete_vm(conn, r["name"]):
+            deleted.append(r["name"])
+            handled += 1
 
     return deleted
 
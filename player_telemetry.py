@@ -0,0 +1,105 @@
+# player_telemetry.py
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from config import AGENT_PORT, TELEMETRY_TIMEOUT, TELEMETRY_WORKERS, DRAIN_TIMEOUT_MINUTES
+
+# Kontrakt mot vm_agent.py (kjører på hver game-VM):
+#   GET  http://<vm>:AGENT_PORT/players  → {"server": "<navn>", "players": <int>, "draining": <bool>}
+#        (503 med "players": null når agenten ikke vet antallet – tolkes som ukjent, aldri 0)
+#   POST http://<vm>:AGENT_PORT/drain    → slutt å ta imot nye spillere
+#   POST http://<vm>:AGENT_PORT/undrain  → ta imot spillere igjen
+
+
+class TelemetryAggregator:
+    """
+    Polls the per-VM agents concurrently over a pooled HTTP session and keeps
+    track of which VMs are being drained before deletion. The agents' drain flag
+    is the source of truth: `draining` is rebuilt from it on every poll, so a
+    restarted manager (or a new owner in a cluster) picks up drains in progress.
+    """
+
+    def __init__(self, port: int = AGENT_PORT, timeout: float = TELEMETRY_TIMEOUT,
+                 workers: int = TELEMETRY_WORKERS):
+        self.port = port
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="telemetry")
+        self.draining = {}  # vm name → time.monotonic() when drain started
+
+    def _url(self, vm: dict, path: str) -> str:
+        return f"http://{vm['address']}:{self.port}{path}"
+
+    def _fetch(self, vm: dict):
+        """(players, draining) from the VM's agent; None for what is unknown."""
+        if not vm.get("address"):
+            return None, None
+        try:
+            r = self.session.get(self._url(vm, "/players"), timeout=self.timeout)
+            body = r.json()
+            draining = body.get("draining")
+            draining = draining if isinstance(draining, bool) else None
+            if r.status_code == 503 or body.get("players") is None:
+                print(f"⚠️ '{vm['name']}' does not know its player count")
+                return None, draining
+            r.raise_for_status()
+            return int(body["players"]), draining
+        except (requests.RequestException, ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"⚠️ No player telemetry from '{vm['name']}': {e}")
+            return None, None
+
+    def poll(self, servers_info: list) -> dict:
+        """
+        Return {vm name: player count} for all VMs, polled concurrently.
+        VMs whose agent did not answer map to None (unknown).
+        Also syncs `draining` with the drain flag each agent reports.
+        """
+        results = list(self.pool.map(self._fetch, servers_info))
+        now = time.monotonic()
+        for vm, (_, draining) in zip(servers_info, results):
+            if draining is True and vm["name"] not in self.draining:
+                # Drain startet før restart/overtakelse: timeouten regnes fra nå
+                self.draining[vm["name"]] = now
+                print(f"🚰 VM '{vm['name']}' is draining (flag set on agent)")
+            elif draining is False:
+                self.draining.pop(vm["name"], None)
+        return {vm["name"]: players for vm, (players, _) in zip(servers_info, results)}
+
+    def _post(self, vm: dict, path: str) -> bool:
+        if not vm.get("address"):
+            return False
+        try:
+            self.session.post(self._url(vm, path), timeout=self.timeout).raise_for_status()
+            return True
+        except requests.RequestException as e:
+            print(f"⚠️ {path} failed for '{vm['name']}': {e}")
+            return False
+
+    def drain(self, vm: dict) -> bool:
+        """Ask the VM's agent to stop accepting players; it is deleted once empty."""
+        if self._post(vm, "/drain"):
+            self.draining.setdefault(vm["name"], time.monotonic())
+            print(f"🚰 Draining VM '{vm['name']}'")
+            return True
+        return False
+
+    def cancel_drain(self, vm: dict) -> bool:
+        if vm["name"] in self.draining and self._post(vm, "/undrain"):
+            del self.draining[vm["name"]]
+            print(f"↩️ Cancelled drain of VM '{vm['name']}'")
+            return True
+        return False
+
+    def drained(self, players: dict) -> list:
+        """Names of draining VMs that are empty (or have hit DRAIN_TIMEOUT_MINUTES)."""
+        now = time.monotonic()
+        return [
+            name for name, started in self.draining.items()
+            if players.get(name) == 0 or now - started > DRAIN_TIMEOUT_MINUTES * 60
+        ]
+
+    def forget(self, name: str):
+        self.draining.pop(name, None)
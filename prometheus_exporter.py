@@ -1,17 +1,32 @@
 import json
+import time
 from flask import Flask, Response
 import os
+from snapshot_channel import SnapshotReceiver
 
 app = Flask(__name__)
 DATA_FILE = "data/games.json"
 
+# Manageren pusher hver syklus hit; games.json brukes bare før første push (f.eks. etter restart)
+receiver = SnapshotReceiver()
+
+
+def load_snapshot():
+    snapshot = receiver.latest
+    if snapshot is not None:
+        return snapshot
 
-def generate_prometheus_metrics():
     if not os.path.exists(DATA_FILE):
-        return ""
+        return None
 
     with open(DATA_FILE, "r") as f:
-        data = json.load(f)
+        return json.load(f)
+
+
+def generate_prometheus_metrics():
+    data = load_snapshot()
+    if data is None:
+        return ""
 
     lines = []
 
@@ -25,6 +40,22 @@ def generate_prometheus_metrics():
             if isinstance(value, (int, float)):
                 lines.append(f'game_{key}{{{label_str}}} {value}')
 
+    # Manager cycle info (only present in pushed snapshots)
+    cycle = data.get("cycle")
+    if cycle:
+        lines.append(f'manager_last_cycle_timestamp_seconds {cycle["timestamp"]}')
+        lines.append(f'manager_snapshot_age_seconds {time.time() - cycle["timestamp"]:.3f}')
+        for phase, seconds in cycle.get("phases", {}).items():
+            lines.append(f'manager_phase_seconds{{phase="{phase}"}} {seconds}')
+        for name, decisions in cycle.get("decisions_total", {}).items():
+            for decision, count in decisions.items():
+                lines.append(f'manager_decisions_total{{name="{name}",decision="{decision}"}} {count}')
+
+    # Siste out-of-band oppskalering (mellom syklusene)
+    out_of_band = data.get("out_of_band")
+    if out_of_band:
+        lines.append(f'manager_last_out_of_band_timestamp_seconds {out_of_band["timestamp"]}')
+
     return "\n".join(lines)
 
 
@@ -34,4 +65,5 @@ def metrics():
 
 
 if __name__ == "__main__":
+    receiver.start()
     app.run(host="0.0.0.0", port=5000)
@@ -1,40 +1,32 @@
 # scaling_algorithms.py
 import json
 import os
-from datetime import datetime
-from config import PLAYERS_PER_VM, LOG_FILE
+import math
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, NamedTuple
+from config import PLAYERS_PER_VM, LOG_FILE, DEFAULT_SCALING_CONFIG, MIN_MINUTES_TO_NEXT_HOUR_FOR_SHUTDOWN
 
-def calculate_vm_count(player_count: int, threshold_percent: float) :
+def calculate_vm_count(player_count: int, threshold_percent: float, players_per_vm: int = PLAYERS_PER_VM) :
     """Generic VM calculation based on threshold_percent remaining."""
-    vm_count = max(1, (player_count + PLAYERS_PER_VM - 1) // PLAYERS_PER_VM)  # ceil division
-    remaining_capacity_percent = 100 - (player_count / (vm_count * PLAYERS_PER_VM) * 100)
+    vm_count = max(1, (player_count + players_per_vm - 1) // players_per_vm)  # ceil division
+    remaining_capacity_percent = 100 - (player_count / (vm_count * players_per_vm) * 100)
     
     if remaining_capacity_percent <= threshold_percent:
         vm_count += 1
     return vm_count
 
-def calculate_aggressive(player_count: int) :
+def calculate_aggressive(player_count: int, players_per_vm: int = PLAYERS_PER_VM) :
     """Aggressive: scale when 10% remaining."""
-    return calculate_vm_count(player_count, threshold_percent=10)
+    return calculate_vm_count(player_count, threshold_percent=10, players_per_vm=players_per_vm)
 
-def calculate_normal(player_count: int) :
+def calculate_normal(player_count: int, players_per_vm: int = PLAYERS_PER_VM) :
     """Normal: scale when 5% remaining."""
-    return calculate_vm_count(player_count, threshold_percent=5)
+    return calculate_vm_count(player_count, threshold_percent=5, players_per_vm=players_per_vm)
 
-def calculate_passive(player_count: int) :
+def calculate_passive(player_count: int, players_per_vm: int = PLAYERS_PER_VM) :
     """Passive: scale when 2% remaining."""
-    return calculate_vm_count(player_count, threshold_percent=2)
-
-def get_scaling_function(strategy: str):
-    mapping = {
-        "normal": calculate_normal,
-        "aggressive": calculate_aggressive,
-        "passive": calculate_passive,
-        "trend": calculate_trend_vm_count,
-        "predictive": calculate_predictive_scaling
-    }
-    return mapping.get(strategy, calculate_normal)
-
+    return calculate_vm_count(player_count, threshold_percent=2, players_per_vm=players_per_vm)
 
 # --- trend_based ---
 
@@ -43,8 +35,9 @@ def calculate_trend_vm_count(
     previous_count: int,
     current_vms: int = None,
     min_vms: int = 1,
-    threshold_percent: float = 95.0,
+    threshold_percent: float = 0.95,
     respect_current_load: bool = True,
+    players_per_vm: int = PLAYERS_PER_VM,
 ) :
 
     print("\n───────────────────────────────")
@@ -53,7 +46,7 @@ def calculate_trend_vm_count(
     print(f"⚙ respect_current_load: {respect_current_load}, min_vms: {min_vms}, threshold%: {threshold_percent}")
 
     if current_vms is None:
-        current_vms = max(min_vms, (current_count + PLAYERS_PER_VM - 1) // PLAYERS_PER_VM)
+        current_vms = max(min_vms, (current_count + players_per_vm - 1) // players_per_vm)
         print(f"ℹ️ current_vms var None → kalkulert: {current_vms}")
 
     # Predict
@@ -62,8 +55,8 @@ def calculate_trend_vm_count(
     print(f"📈 Predicted next count: {next_trend_count} (diff: {diff})")
 
     # Capacity calculation
-    last_vm_capacity = int(PLAYERS_PER_VM * threshold_percent)
-    safe_total_capacity = (current_vms - 1) * PLAYERS_PER_VM + last_vm_capacity
+    last_vm_capacity = int(players_per_vm * threshold_percent)
+    safe_total_capacity = (current_vms - 1) * players_per_vm + last_vm_capacity
     print(f"📦 Safe capacity @ {current_vms} VMs: {safe_total_capacity} (last VM: {last_vm_capacity})")
 
     new_vms = current_vms
@@ -73,7 +66,7 @@ def calculate_trend_vm_count(
     if next_trend_count > safe_total_capacity:
         print("⚠️ Skal opp: predicted > safe capacity")
 
-        extra_players = next_trend_count - ((current_vms - 1) * PLAYERS_PER_VM)
+        extra_players = next_trend_count - ((current_vms - 1) * players_per_vm)
         needed_vms_est = current_vms - 1 + int(-(-extra_players // last_vm_capacity))
         new_vms = max(min_vms, needed_vms_est)
 
@@ -81,7 +74,7 @@ def calculate_trend_vm_count(
 
         # Safety check loop
         while True:
-            safe_cap_check = (new_vms - 1) * PLAYERS_PER_VM + last_vm_capacity
+            safe_cap_check = (new_vms - 1) * players_per_vm + last_vm_capacity
             print(f"  ➤ Sjekker {new_vms} VMs → {safe_cap_check} safe")
 
             if next_trend_count <= safe_cap_check:
@@ -98,14 +91,14 @@ def calculate_trend_vm_count(
         # Direct right-sizing using actual load
         ideal_vms = max(
             min_vms,
-            int(-((current_count - last_vm_capacity) // -PLAYERS_PER_VM)) + 1
+            int(-((current_count - last_vm_capacity) // -players_per_vm)) + 1
             if current_count > last_vm_capacity else 1
         )
 
         print(f"🧮 Beregnet ideell VMs for faktisk load: {ideal_vms}")
 
         if respect_current_load:
-            safe_current_cap = (ideal_vms - 1) * PLAYERS_PER_VM + last_vm_capacity
+            safe_current_cap = (ideal_vms - 1) * players_per_vm + last_vm_capacity
             print(f"   🔐 Sikker sjekk mot threshold → {safe_current_cap}")
 
         if ideal_vms < current_vms:
@@ -113,7 +106,7 @@ def calculate_trend_vm_count(
             decision = f"🧊 Nedskalering → {new_vms} VMs"
 
     # Final logging
-    safe_final_cap = (new_vms - 1) * PLAYERS_PER_VM + last_vm_capacity
+    safe_final_cap = (new_vms - 1) * players_per_vm + last_vm_capacity
     print(f"🔥 Final VMs: {new_vms}, Safe capacity: {safe_final_cap}")
     print(f"➡️ Decision: {decision}")
     print("───────────────────────────────\n")
@@ -134,13 +127,17 @@ os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
 
 _last_logged = {}  # store last logged values per game/time
 
+# Når en DecisionPool kjører strategiene, samles logglinjene per oppgave her og skrives
+# av hovedtråden etterpå (write_vm_change), så fil og _last_logged bare har én eier.
+_log_capture = threading.local()
+
+
 def log_vm_change(game_name, current_day, current_hour, current_minute,
                   current_players, expected_now, deviation_now,
                   expected_next, corrected_future, required_vms):
     """
     Logs predictive scaling calculations only when something changed.
     """
-    global _last_logged
     timestamp = datetime.now().isoformat()
 
     # Build current state tuple
@@ -149,13 +146,6 @@ def log_vm_change(game_name, current_day, current_hour, current_minute,
     # Key per game + time
     key = f"{game_name}_{current_day}_{current_hour}:{current_minute}"
 
-    # Check if last logged state is the same
-    if key in _last_logged and _last_logged[key] == current_state:
-        return  # nothing changed, skip logging
-
-    # Save current state for future checks
-    _last_logged[key] = current_state
-
     # Format deviation
     deviation_percent = deviation_now * 100
     deviation_str = f"{deviation_percent:+.1f}%"
@@ -167,6 +157,22 @@ def log_vm_change(game_name, current_day, current_hour, current_minute,
         f"Corrected Future: {corrected_future:.0f} | Calculated VMs: {required_vms}\n"
     )
 
+    records = getattr(_log_capture, "records", None)
+    if records is not None:
+        records.append((key, current_state, line))
+        return
+    write_vm_change(key, current_state, line)
+
+
+def write_vm_change(key, current_state, line):
+    """Append one log line to LOG_FILE, unless the same state was already logged for `key`."""
+    # Check if last logged state is the same
+    if key in _last_logged and _last_logged[key] == current_state:
+        return  # nothing changed, skip logging
+
+    # Save current state for future checks
+    _last_logged[key] = current_state
+
     os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
     with open(LOG_FILE, "a") as f:
         f.write(line)
@@ -184,12 +190,14 @@ if os.path.exists(PLAYER_PATTERN_FILE):
 else:
     player_patterns = []  # fallback
 
+# Oppslag (day, hour, minute) → avg_playercount; første forekomst vinner ved duplikater
+_pattern_index = {}
+for entry in player_patterns:
+    _pattern_index.setdefault((entry["day"], entry["hour"], entry["minute"]), entry["avg_playercount"])
+
 # --- Funksjon for å hente forventet spillerantall ---
 def get_expected_players(day: str, hour: str, minute: str):
-    for entry in player_patterns:
-        if entry["day"] == day and entry["hour"] == hour and entry["minute"] == minute:
-            return entry["avg_playercount"]
-    return None
+    return _pattern_index.get((day, hour, minute))
 
 
 def calculate_predictive_scaling(
@@ -203,6 +211,7 @@ def calculate_predictive_scaling(
     PLAYERS_PER_VM: int = PLAYERS_PER_VM,
     buffer: int = 75,
     respect_current_load: bool = False,
+    game_name: str = "CounterStrike",
 ):
     """
     Predictive scaling basert på nåværende avvik.
@@ -280,7 +289,7 @@ def calculate_predictive_scaling(
     
     # Legg til logging:
     log_vm_change(
-        game_name="CounterStrike",  # du må sende inn spillets navn til funksjonen
+        game_name=game_name,
         current_day=current_day,
         current_hour=current_hour,
         current_minute=current_minute,
@@ -303,3 +312,211 @@ def calculate_predictive_scaling(
 
 
 
+# --- strategy registry ---
+# Hver strategi registrerer seg selv med hvilke parametere den godtar (med default-verdier)
+# og hvilke tilstandsfelt (fra GameSample) den leser. Nye strategier trenger bare
+# @register_strategy – fetch-loopen trenger ingen endring.
+
+class GameSample(NamedTuple):
+    """Snapshot of one game for a single scaling decision."""
+    title: str
+    player_count: int
+    previous_count: int
+    current_vms: int
+    now: datetime
+    billing_minutes: tuple = ()   # minutes left of the paid hour, per running VM
+
+
+class ScalingStrategy(NamedTuple):
+    name: str
+    func: Callable
+    params: dict      # parameter name -> default value
+    state: tuple      # GameSample fields the strategy reads
+
+
+STRATEGIES: dict[str, ScalingStrategy] = {}
+
+
+def register_strategy(name: str, params: dict | None = None, state: tuple = ("player_count",)):
+    """
+    Register a strategy adapter under `name`.
+    The adapter is called as func(sample, **params, players_per_vm=...) and must
+    return (vm_count, expected_players).
+    """
+    def decorator(func):
+        STRATEGIES[name] = ScalingStrategy(name, func, dict(params or {}), tuple(state))
+        return func
+    return decorator
+
+
+def _default(key, fallback):
+    return DEFAULT_SCALING_CONFIG.get(key, fallback)
+
+
+@register_strategy("normal", params={"buffer": _default("buffer", 1)})
+def _normal_strategy(sample: GameSample, buffer: int, players_per_vm: int = PLAYERS_PER_VM):
+    return calculate_normal(sample.player_count, players_per_vm) + buffer, None
+
+
+@register_strategy("aggressive", params={"buffer": _default("buffer", 1)})
+def _aggressive_strategy(sample: GameSample, buffer: int, players_per_vm: int = PLAYERS_PER_VM):
+    return calculate_aggressive(sample.player_count, players_per_vm) + buffer, None
+
+
+@register_strategy("passive", params={"buffer": _default("buffer", 1)})
+def _passive_strategy(sample: GameSample, buffer: int, players_per_vm: int = PLAYERS_PER_VM):
+    return calculate_passive(sample.player_count, players_per_vm) + buffer, None
+
+
+@register_strategy(
+    "trend",
+    params={"threshold_percent": 0.95, "respect_current_load": False},
+    state=("player_count", "previous_count", "current_vms"),
+)
+def _trend_strategy(sample: GameSample, threshold_percent: float, respect_current_load: bool,
+                    players_per_vm: int = PLAYERS_PER_VM):
+    vm_count = calculate_trend_vm_count(
+        current_count=sample.player_count,
+        previous_count=sample.previous_count,
+        current_vms=sample.current_vms,
+        threshold_percent=threshold_percent,
+        respect_current_load=respect_current_load,
+        players_per_vm=players_per_vm,
+    )
+    return vm_count, None
+
+
+@register_strategy(
+    "predictive",
+    params={
+        "time_offset_hours": _default("time_offset_hours", 0),
+        "lookahead_intervals": _default("lookahead_intervals", 3),
+        "buffer": _default("buffer", 1),
+        "respect_current_load": False,
+    },
+    state=("title", "player_count", "current_vms", "now"),
+)
+def _predictive_strategy(sample: GameSample, time_offset_hours: int, lookahead_intervals: int,
+                         buffer: int, respect_current_load: bool,
+                         players_per_vm: int = PLAYERS_PER_VM):
+    now = sample.now
+    vm_count, corrected_future, _ = calculate_predictive_scaling(
+        now.strftime("%A").lower(), f"{now.hour:02d}", f"{(now.minute // 5) * 5:02d}",
+        sample.player_count, sample.current_vms,
+        time_offset_hours=time_offset_hours,
+        lookahead_intervals=lookahead_intervals,
+        PLAYERS_PER_VM=players_per_vm,
+        buffer=buffer,
+        respect_current_load=respect_current_load,
+        game_name=sample.title,
+    )
+    return vm_count, corrected_future
+
+
+
+
+
+
+# --- cost_optimal (forecast + timebasert fakturering) ---
+# OpenStack fakturerer per påbegynte time fra oppstart. En VM som allerede er betalt ut timen
+# er "gratis" til timen er omme, så planen gjenbruker betalte timer før den starter nye.
+
+SLOT_MINUTES = 5
+SLOTS_PER_HOUR = 60 // SLOT_MINUTES
+
+
+def forecast_players(now: datetime, current_player_count: int, horizon_slots: int,
+                     time_offset_hours: int = 0) -> list | None:
+    """
+    Expected players for each 5-minute slot from `now`, from player_pattern
+    scaled by today's deviation (same idea as predictive). None without pattern data.
+    """
+    base = now.replace(minute=(now.minute // SLOT_MINUTES) * SLOT_MINUTES, second=0, microsecond=0)
+    base += timedelta(hours=time_offset_hours)
+
+    def expected_at(t):
+        return get_expected_players(t.strftime("%A").lower(), f"{t.hour:02d}", f"{t.minute:02d}")
+
+    expected_now = expected_at(base)
+    if not expected_now or expected_now <= 0:
+        return None
+    factor = current_player_count / expected_now
+
+    forecast = []
+    last = expected_now
+    for k in range(horizon_slots):
+        value = expected_at(base + timedelta(minutes=SLOT_MINUTES * k))
+        if value is not None:
+            last = value
+        forecast.append(last * factor)  # hull i mønsteret → bruk forrige kjente verdi
+    return forecast
+
+
+def plan_billing_schedule(required: list, billing_minutes=()) -> tuple[list, int]:
+    """
+    Cheapest start/stop schedule that meets `required` VMs in every 5-minute slot.
+    billing_minutes: minutes left of the paid hour for each running VM.
+
+    Greedy over slots: VMs keep running until their paid hour ends; only when a
+    slot is short, expiring VMs are renewed (then new ones started) for a full
+    hour from that slot. Starting each hour as late as possible is optimal when
+    every VM-hour costs the same.
+    Returns (running VMs per slot, number of VM-hours billed).
+    """
+    n = len(required)
+    expire = [0] * (n + SLOTS_PER_HOUR + 1)
+    active = 0
+    for minutes in billing_minutes:
+        expire[min(math.ceil(max(minutes, 0) / SLOT_MINUTES), n)] += 1
+        active += 1
+
+    running = [0] * n
+    billed_hours = 0
+    for t in range(n):
+        active -= expire[t]
+        need = required[t] - active
+        if need > 0:
+            active += need
+            expire[t + SLOTS_PER_HOUR] += need
+            billed_hours += need
+        running[t] = active
+    return running, billed_hours
+
+
+@register_strategy(
+    "cost_optimal",
+    params={
+        "time_offset_hours": _default("time_offset_hours", 0),
+        "horizon_hours": 3,
+        "buffer": _default("buffer", 1),
+        "respect_current_load": True,
+    },
+    state=("player_count", "current_vms", "now", "billing_minutes"),
+)
+def _cost_optimal_strategy(sample: GameSample, time_offset_hours: int, horizon_hours: int,
+                           buffer: int, respect_current_load: bool,
+                           players_per_vm: int = PLAYERS_PER_VM,
+                           min_minutes_to_next_hour_for_shutdown: float = MIN_MINUTES_TO_NEXT_HOUR_FOR_SHUTDOWN):
+    horizon = max(1, int(horizon_hours * SLOTS_PER_HOUR))
+    forecast = forecast_players(sample.now, sample.player_count, horizon, time_offset_hours)
+    if forecast is None:
+        print(f"⚠️ {sample.title}: ingen mønsterdata for cost_optimal — ingen endring.")
+        return sample.current_vms, None
+
+    required = [max(1, math.ceil((players + buffer) / players_per_vm)) for players in forecast]
+    if respect_current_load:
+        required[0] = max(required[0], math.ceil(sample.player_count / players_per_vm))
+
+    # Ukjente klokker (ingen ekte VMs for spillet): anta at timen er brukt opp nå
+    billing = sample.billing_minutes or (0,) * sample.current_vms
+    running, billed_hours = plan_billing_schedule(required, billing)
+
+    # Nå kjører planen running[0] VMs. VMs den lar utløpe innen shutdown-vinduet må stoppes
+    # nå (stop_vms kan bare stoppe dem mens de er i vinduet), ellers betales en ny time.
+    # VMs som planen først starter senere i vinduet startes ikke før – min() i stedet for max().
+    window = min(math.ceil(min_minutes_to_next_hour_for_shutdown / SLOT_MINUTES), horizon - 1)
+    vm_count = max(required[0], min(running[0], running[window]))
+
+    print(f"💰 {sample.title}: cost_optimal → {vm_count} VMs nå, {billed_hours} VM-timer "
+          f"over {horizon_hours}t (topp {max(required)} VMs)")
+    return vm_count, forecast[0]
@@ -0,0 +1,191 @@
+# scaling_pipeline.py
+import inspect
+import json
+from functools import partial
+from config import (
+    GAME_SCALING_CONFIG, DEFAULT_SCALING_CONFIG, HOURLY_PRICE, PLAYERS_PER_VM,
+    MIN_MINUTES_TO_NEXT_HOUR_FOR_SHUTDOWN
+)
+from scaling_algorithms import STRATEGIES, GameSample
+
+# Nøkler som gjelder alle strategier (håndteres av pipelinen, ikke strategien)
+PIPELINE_KEYS = {"strategy", "max_hourly_budget"}
+
+
+def enforce_hourly_budget(vm_count: int, hourly_price: float, max_budget: float | None) -> int:
+    """
+    Checks if the VM count exceeds the hourly budget.
+    If it does, returns the maximum VMs allowed within the budget.
+    If no budget is set (None), returns the original vm_count.
+    """
+    if max_budget is None:
+        return vm_count
+    max_vms = max(1, int(max_budget // hourly_price))  # ensure at least 1 VM
+    if vm_count > max_vms:
+        print(f"⚠️ Hourly budget exceeded: {vm_count * hourly_price:.2f} > {max_budget:.2f}, "
+              f"limiting to {max_vms} VM(s).")
+        return max_vms
+    return vm_count
+
+
+def stabilize_vm_count(vm_count) -> int:
+    """Final stage: whole VMs only, never below 1."""
+    return max(1, int(vm_count))
+
+
+class GamePipeline:
+    """
+    Compiled decision pipeline for one game: strategy → budget cap → stabilizer.
+    All config lookups happen at compile time; calling it is a straight run through.
+    """
+    __slots__ = ("title", "strategy", "state", "config", "signature", "_decide", "_cap")
+
+    def __init__(self, title, strategy, state, config, signature, decide, cap):
+        self.title = title
+        self.strategy = strategy
+        self.state = state
+        self.config = config
+        self.signature = signature
+        self._decide = decide
+        self._cap = cap
+
+    def __call__(self, sample: GameSample):
+        vm_count, expected_players = self._decide(sample)
+        if self._cap is not None:
+            vm_count = self._cap(vm_count)
+        return stabilize_vm_count(vm_count), expected_players
+
+    def __repr__(self):
+        return f"GamePipeline({self.title!r}, strategy={self.strategy!r})"
+
+
+# Gyldige verdier per nøkkel: (test, beskrivelse). Typen sjekkes først i _check_type.
+PARAM_RANGES = {
+    "threshold_percent": (lambda v: 0 < v <= 1, "a fraction in (0, 1], e.g. 0.8 – not a percentage"),
+    "buffer": (lambda v: v >= 0, ">= 0"),
+    "lookahead_intervals": (lambda v: v > 0, "> 0"),
+    "horizon_hours": (lambda v: v > 0, "> 0"),
+}
+
+
+def _check_range(title, key, value):
+    rule = PARAM_RANGES.get(key)
+    if rule is not None and not rule[0](value):
+        raise ValueError(f"{title}: '{key}' must be {rule[1]}, got {value!r}")
+
+
+def _check_type(title, key, value, default):
+    if isinstance(default, bool):
+        ok = isinstance(value, bool)
+    elif isinstance(default, (int, float)):
+        ok = isinstance(value, (int, float)) and not isinstance(value, bool)
+    else:
+        ok = True
+    if not ok:
+        raise ValueError(f"{title}: '{key}' must be {type(default).__name__}, got {value!r}")
+
+
+def pipeline_signature(game_conf: dict, default_conf: dict, hourly_price: float,
+                       players_per_vm: int,
+                       min_minutes: float = MIN_MINUTES_TO_NEXT_HOUR_FOR_SHUTDOWN) -> str:
+    """Everything a compiled pipeline depends on, as a comparable string."""
+    return json.dumps([game_conf, default_conf, hourly_price, players_per_vm, min_minutes],
+                      sort_keys=True)
+
+
+def compile_pipeline(title: str, game_conf: dict, default_conf: dict = DEFAULT_SCALING_CONFIG,
+                     hourly_price: float = HOURLY_PRICE,
+                     players_per_vm: int = PLAYERS_PER_VM,
+                     min_minutes: float = MIN_MINUTES_TO_NEXT_HOUR_FOR_SHUTDOWN) -> GamePipeline:
+    """
+    Validate one game's config and bind it into a GamePipeline.
+    Missing values fall back to default_conf, then to the strategy's own defaults.
+    Settings from ScalingSettings (players_per_vm, and the shutdown window for
+    strategies that take min_minutes_to_next_hour_for_shutdown) are bound in too.
+    Raises ValueError for unknown strategies, unknown keys or wrongly typed values.
+    """
+    strategy_name = game_conf.get("strategy", default_conf.get("strategy", "normal"))
+    strategy = STRATEGIES.get(strategy_name)
+    if strategy is None:
+        raise ValueError(f"{title}: unknown scaling strategy '{strategy_name}' "
+                         f"(known: {', '.join(sorted(STRATEGIES))})")
+
+    # Nøkler som ingen strategi kjenner er nesten alltid skrivefeil
+    known_keys = PIPELINE_KEYS.union(*(s.params for s in STRATEGIES.values()))
+    unknown = set(game_conf) - known_keys
+    if unknown:
+        raise ValueError(f"{title}: unknown config key(s): {', '.join(sorted(unknown))}")
+
+    # Nøkler for en annen strategi brukes ikke nå, men typesjekkes likevel (de blir brukt ved bytte)
+    for other in STRATEGIES.values():
+        for key, fallback in other.params.items():
+            if key in game_conf and key not in strategy.params:
+                _check_type(title, key, game_conf[key], fallback)
+                _check_range(title, key, game_conf[key])
+
+    params = {}
+    for key, fallback in strategy.params.items():
+        value = game_conf.get(key, default_conf.get(key, fallback))
+        _check_type(title, key, value, fallback)
+        _check_range(title, key, value)
+        params[key] = value
+
+    max_budget = game_conf.get("max_hourly_budget")
+    if max_budget is not None:
+        _check_type(title, "max_hourly_budget", max_budget, 0.0)
+        if max_budget <= 0:
+            raise ValueError(f"{title}: 'max_hourly_budget' must be positive")
+        cap = partial(enforce_hourly_budget, hourly_price=hourly_price, max_budget=max_budget)
+    else:
+        cap = None
+
+    resolved = dict(params, strategy=strategy_name, max_hourly_budget=max_budget)
+    bound = {"players_per_vm": players_per_vm}
+    if "min_minutes_to_next_hour_for_shutdown" in inspect.signature(strategy.func).parameters:
+        bound["min_minutes_to_next_hour_for_shutdown"] = min_minutes
+    decide = partial(strategy.func, **bound, **params)
+    signature = pipeline_signature(game_conf, default_conf, hourly_price, players_per_vm, min_minutes)
+    return GamePipeline(title, strategy_name, strategy.state, resolved, signature, decide, cap)
+
+
+class PipelineSet:
+    """Compiled pipelines for all configured games, with a shared pipeline for the rest."""
+
+    def __init__(self, pipelines: dict, default: GamePipeline):
+        self.pipelines = pipelines
+        self.default = default
+
+    def get(self, title: str) -> GamePipeline:
+        return self.pipelines.get(title, self.default)
+
+    def __len__(self):
+        return len(self.pipelines)
+
+
+def compile_pipelines(game_config: dict = GAME_SCALING_CONFIG,
+                      default_conf: dict = DEFAULT_SCALING_CONFIG,
+                      hourly_price: float = HOURLY_PRICE,
+                      players_per_vm: int = PLAYERS_PER_VM,
+                      previous: PipelineSet | None = None,
+                      min_minutes: float = MIN_MINUTES_TO_NEXT_HOUR_FOR_SHUTDOWN) -> PipelineSet:
+    """
+    Validate and compile every game's config (at startup, and on config reload).
+    If `previous` is given, pipelines whose inputs are unchanged are reused as-is
+    and only the changed games are recompiled.
+    """
+    def build(title, conf):
+        old = None
+        if previous is not None:
+            old = previous.default if title == "<default>" else previous.pipelines.get(title)
+        if old is not None and old.signature == pipeline_signature(conf, default_conf, hourly_price,
+                                                                   players_per_vm, min_minutes):
+            return old
+        compiled.append(title)
+        return compile_pipeline(title, conf, default_conf, hourly_price, players_per_vm, min_minutes)
+
+    compiled = []
+    pipelines = {title: build(title, conf) for title, conf in game_config.items()}
+    default = build("<default>", default_conf)
+    print(f"🧩 Compiled {len(compiled)} scaling pipeline(s): "
+          + (", ".join(f"{t} → {(pipelines.get(t) or default).strategy}" for t in compiled) or "none"))
+    return PipelineSet(pipelines, default)
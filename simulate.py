@@ -0,0 +1,388 @@
+# simulate.py
+# What-if simulator: kjører skaleringspipelinen over flere døgn med last fra player_pattern
+# eller fra historikken (timeseries_store), for et grid av parametere per spill.
+# Hvert gridpunkt gir kostnad (fakturerte VM-timer) og minutter med for lite kapasitet,
+# og Pareto-fronten av de to skrives ut. Resultater caches i SIM_CACHE_DIR.
+#
+#   python simulate.py --game "Counter Strike" --days 3 \
+#       --grid buffer=1,75,200 --grid lookahead_intervals=1,3,6 --grid max_hourly_budget=null,6
+#   python simulate.py --source history --days 2
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+import scaling_algorithms
+from scaling_algorithms import GameSample, STRATEGIES, PLAYER_PATTERN_FILE, get_expected_players
+from scaling_pipeline import PIPELINE_KEYS, compile_pipeline
+from config_watcher import ScalingSettings, default_settings, parse_settings
+from timeseries_store import TimeSeriesStore
+from config import UPDATE_INTERVAL, SCALING_CONFIG_FILE, HISTORY_DIR, SIM_CACHE_DIR
+
+OSLO = ZoneInfo("Europe/Oslo")
+CACHE_VERSION = 2  # øk ved endringer i simuleringen, så gamle resultater ikke gjenbrukes
+
+# Brukes når ingen --grid er gitt; nøkler strategien ikke bruker fjernes per spill
+DEFAULT_GRID = {
+    "buffer": [1, 75, 200, 500],
+    "threshold_percent": [0.4, 0.6, 0.8, 0.95],  # andel av siste VM (trend), ikke prosent
+    "lookahead_intervals": [1, 3, 6],
+    "time_offset_hours": [-6, 0],
+    "max_hourly_budget": [None],
+}
+
+
+# ==================================================
+# === Last ===
+# ==================================================
+
+def pattern_load(start: datetime, days: float, step: int = UPDATE_INTERVAL,
+                 scale: float = 1.0, noise_percent: float = 0.0, seed: int = 0):
+    """
+    Player counts from player_pattern every `step` seconds, optionally with
+    multiplicative noise (seeded, so the load is reproducible).
+    Returns (timestamps, player counts).
+    """
+    rng = random.Random(seed)
+    ts, players = [], []
+    last = 0
+    t = start
+    end = start + timedelta(days=days)
+    while t < end:
+        value = get_expected_players(t.strftime("%A").lower(), f"{t.hour:02d}", f"{t.minute // 5 * 5:02d}")
+        if value is not None:
+            last = value
+        noise = 1 + rng.uniform(-noise_percent, noise_percent) / 100 if noise_percent else 1
+        ts.append(t.timestamp())
+        players.append(max(0, round(last * scale * noise)))
+        t += timedelta(seconds=step)
+    return ts, players
+
+
+def history_load(store: TimeSeriesStore, title: str, start: datetime, days: float):
+    """Recorded player counts for one game from the time-series store."""
+    data = store.query(title, start.timestamp(), (start + timedelta(days=days)).timestamp(),
+                       ["player_count"])
+    return list(data["ts"]), list(data["player_count"])
+
+
+def load_fingerprint(ts, players) -> str:
+    h = hashlib.sha1()
+    h.update(array("d", ts).tobytes())
+    h.update(array("i", players).tobytes())
+    return h.hexdigest()
+
+
+def _pattern_fingerprint() -> str:
+    # predictive/cost_optimal leser mønsteret selv, så det er en del av cache-nøkkelen
+    try:
+        with open(PLAYER_PATTERN_FILE, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return ""
+
+
+# ==================================================
+# === Simulering ===
+# ==================================================
+
+def _paid_hours(seconds: float) -> int:
+    return max(1, math.ceil(seconds / 3600))
+
+
+def simulate(pipeline, title: str, ts: list, players: list, settings: ScalingSettings) -> dict:
+    """
+    Replay the load through one compiled pipeline, one decision per sample.
+    VMs are billed per started hour and (like stop_vms) only stopped when they
+    are within min_minutes_to_next_hour_for_shutdown of their next billed hour.
+    Capacity decided at a sample must cover the load at the next sample;
+    every interval where it does not counts as unmet minutes.
+    """
+    ppv = settings.players_per_vm
+    min_minutes = settings.min_minutes_to_next_hour_for_shutdown
+    wants_clocks = "billing_minutes" in pipeline.state
+    step = (ts[-1] - ts[0]) / (len(ts) - 1) if len(ts) > 1 else UPDATE_INTERVAL
+
+    started = [ts[0]] * max(1, math.ceil(players[0] / ppv))  # starttid per kjørende VM
+    billed_hours = 0
+    unmet_minutes = 0.0
+    unmet_player_minutes = 0.0
+    peak_vms = len(started)
+    previous = players[0]
+
+    for i, (t, count) in enumerate(zip(ts, players)):
+        clocks = tuple(60 - ((t - s) / 60) % 60 for s in started) if wants_clocks else ()
+        sample = GameSample(title, count, previous, len(started),
+                            datetime.fromtimestamp(t, OSLO), clocks)
+        vm_count, _ = pipeline(sample)
+        previous = count
+
+        if vm_count > len(started):
+            started.extend([t] * (vm_count - len(started)))
+        elif vm_count < len(started):
+            # Samme regel som recommend_shutdown: bare VMs nær neste time, nærmest først
+            left = sorted((60 - ((t - s) / 60) % 60, j) for j, s in enumerate(started))
+            stop = set([j for minutes, j in left if minutes <= min_minutes][:len(started) - vm_count])
+            billed_hours += sum(_paid_hours(t - started[j]) for j in stop)
+            started = [s for j, s in enumerate(started) if j not in stop]
+        peak_vms = max(peak_vms, len(started))
+
+        if i + 1 < len(ts):
+            dt_minutes = (ts[i + 1] - t) / 60
+            shortfall = players[i + 1] - len(started) * ppv
+            if shortfall > 0:
+                unmet_minutes += dt_minutes
+                unmet_player_minutes += shortfall * dt_minutes
+
+    end = ts[-1] + step
+    billed_hours += sum(_paid_hours(end - s) for s in started)
+    return {
+        "cost": round(billed_hours * settings.hourly_price, 2),
+        "vm_hours": billed_hours,
+        "unmet_minutes": round(unmet_minutes, 1),
+        "unmet_player_minutes": round(unmet_player_minutes),
+        "peak_vms": peak_vms,
+    }
+
+
+# ==================================================
+# === Grid, cache og workers ===
+# ==================================================
+
+def parse_grid(specs: list) -> dict:
+    """["buffer=1,75", "max_hourly_budget=null,6"] → {"buffer": [1, 75], ...} (JSON values)."""
+    grid = {}
+    for spec in specs:
+        key, sep, values = spec.partition("=")
+        if not sep or not values:
+            raise ValueError(f"bad --grid '{spec}' (use key=v1,v2,...)")
+        parsed = []
+        for value in values.split(","):
+            try:
+                parsed.append(json.loads(value))
+            except json.JSONDecodeError:
+                parsed.append(value)  # strategi-navn o.l.
+        grid[key.strip()] = parsed
+    return grid
+
+
+def grid_points(title: str, base_conf: dict, grid: dict, settings: ScalingSettings) -> list:
+    """
+    Every grid combination as a compiled pipeline, plus the game's current config.
+    Keys the point's strategy does not use are dropped, so combinations that only
+    differ in unused keys are simulated once. None removes a key (e.g. no budget).
+    Returns [(swept params, pipeline)], the current config first.
+    """
+    default_conf = settings.default_scaling_config
+    points, seen = [], set()
+    combos = [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+    for combo in [{}] + combos:
+        conf = dict(base_conf)
+        strategy = combo.get("strategy", conf.get("strategy", default_conf.get("strategy", "normal")))
+        if strategy not in STRATEGIES:
+            print(f"⚠️ {title}: skipping unknown strategy '{strategy}'")
+            continue
+        used = PIPELINE_KEYS | set(STRATEGIES[strategy].params)
+        swept = {k: v for k, v in combo.items() if k in used}
+        for key, value in swept.items():
+            if value is None:
+                conf.pop(key, None)
+            else:
+                conf[key] = value
+        try:
+            pipeline = compile_pipeline(title, conf, default_conf, settings.hourly_price,
+                                        settings.players_per_vm,
+                                        settings.min_minutes_to_next_hour_for_shutdown)
+        except ValueError as e:
+            print(f"⚠️ Skipping grid point: {e}")
+            continue
+        if pipeline.signature not in seen:
+            seen.add(pipeline.signature)
+            points.append((swept, pipeline))
+    return points
+
+
+def cache_key(pipeline, load_fp: str, pattern_fp: str, settings: ScalingSettings) -> str:
+    raw = json.dumps([CACHE_VERSION, pipeline.title, pipeline.signature, load_fp, pattern_fp,
+                      settings.min_minutes_to_next_hour_for_shutdown], sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _cache_path(cache_dir: str, key: str) -> str:
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def _quiet():
+    """No debug prints, no writes to the real vm_changes.log (also used as worker initializer)."""
+    sys.stdout = open(os.devnull, "w")
+    scaling_algorithms.LOG_FILE = os.devnull
+
+
+# Lasten sendes til hver worker én gang (initializer), ikke med hver oppgave
+_worker_loads = {}
+_worker_settings = None
+
+
+def _init_worker(loads: dict, settings: ScalingSettings):
+    global _worker_loads, _worker_settings
+    _quiet()
+    _worker_loads, _worker_settings = loads, settings
+
+
+def _run_point(task):
+    key, pipeline = task
+    ts, players = _worker_loads[pipeline.title]
+    return key, simulate(pipeline, pipeline.title, ts, players, _worker_settings)
+
+
+def pareto_frontier(results: list) -> list:
+    """Results no other result beats on both cost and unmet minutes, cheapest first."""
+    frontier = []
+    best_unmet = float("inf")
+    for r in sorted(results, key=lambda r: (r["cost"], r["unmet_minutes"])):
+        if r["unmet_minutes"] < best_unmet:
+            frontier.append(r)
+            best_unmet = r["unmet_minutes"]
+    return frontier
+
+
+# ==================================================
+# === CLI ===
+# ==================================================
+
+def load_settings(path: str) -> ScalingSettings:
+    if not os.path.exists(path):
+        return default_settings()
+    with open(path, "r") as f:
+        return parse_settings(json.load(f))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="What-if simulation of scaling parameters.")
+    parser.add_argument("--game", action="append", help="game title (repeatable; default: all configured)")
+    parser.add_argument("--source", choices=["pattern", "history"], default="pattern")
+    parser.add_argument("--start", help="start date YYYY-MM-DD (default: today for pattern, "
+                                        "the last --days for history)")
+    parser.add_argument("--days", type=float, default=3)
+    parser.add_argument("--step", type=int, default=UPDATE_INTERVAL, help="pattern sample interval (s)")
+    parser.add_argument("--scale", type=float, default=1.0, help="pattern load multiplier")
+    parser.add_argument("--noise", type=float, default=0.0, help="pattern noise in percent (±)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--grid", action="append", default=[], help="key=v1,v2,... (repeatable)")
+    parser.add_argument("--config", default=SCALING_CONFIG_FILE)
+    parser.add_argument("--history-dir", default=HISTORY_DIR)
+    parser.add_argument("--cache-dir", default=SIM_CACHE_DIR)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--all", action="store_true", help="print every grid point, not just the frontier")
+    parser.add_argument("--json", help="write all results to this file")
+    args = parser.parse_args()
+
+    settings = load_settings(args.config)
+    grid = parse_grid(args.grid) if args.grid else DEFAULT_GRID
+    store = TimeSeriesStore(args.history_dir) if args.source == "history" else None
+
+    if args.start:
+        start = datetime.strptime(args.start, "%Y-%m-%d").replace(tzinfo=OSLO)
+    else:
+        now = datetime.now(OSLO)
+        start = now - timedelta(days=args.days) if store else now.replace(hour=0, minute=0, second=0,
+                                                                           microsecond=0)
+    titles = args.game or (store.titles() if store else list(settings.game_scaling_config))
+
+    # --- Last per spill (mønsteret gir samme kurve for alle spill) ---
+    loads = {}
+    for title in titles:
+        if store is not None:
+            ts, players = history_load(store, title, start, args.days)
+        else:
+            ts, players = pattern_load(start, args.days, args.step, args.scale, args.noise, args.seed)
+        if len(ts) < 2:
+            print(f"⚠️ {title}: not enough load data, skipped")
+            continue
+        loads[title] = (ts, players)
+
+    # --- Gridpunkter: hent fra cache, resten simuleres ---
+    pattern_fp = _pattern_fingerprint()
+    real_stdout = sys.stdout
+    _quiet()  # compile/strategier printer mye
+    points = {title: grid_points(title, settings.game_scaling_config.get(title, {}), grid, settings)
+              for title in loads}
+    sys.stdout = real_stdout
+
+    results = {}
+    pending = []
+    for title, game_points in points.items():
+        load_fp = load_fingerprint(*loads[title])
+        for swept, pipeline in game_points:
+            key = cache_key(pipeline, load_fp, pattern_fp, settings)
+            results[key] = {"game": title, "params": swept, "strategy": pipeline.strategy}
+            path = _cache_path(args.cache_dir, key)
+            if not args.no_cache and os.path.exists(path):
+                with open(path, "r") as f:
+                    results[key].update(json.load(f))
+            else:
+                pending.append((key, pipeline))
+
+    total = len(results)
+    print(f"📊 {len(loads)} game(s), {total} grid point(s), {total - len(pending)} cached, "
+          f"{len(pending)} to simulate on {min(args.workers, max(1, len(pending)))} worker(s)")
+
+    started_at = time.perf_counter()
+    os.makedirs(args.cache_dir, exist_ok=True)
+
+    def store_result(key, result):
+        results[key].update(result)
+        with open(_cache_path(args.cache_dir, key), "w") as f:
+            json.dump(result, f)
+
+    if args.workers > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                 initargs=({t: loads[t] for t in loads}, settings)) as executor:
+            for future in as_completed([executor.submit(_run_point, task) for task in pending]):
+                store_result(*future.result())
+    else:
+        _init_worker(loads, settings)
+        for task in pending:
+            store_result(*_run_point(task))
+        sys.stdout = real_stdout
+    if pending:
+        print(f"⏱ Simulated {len(pending)} point(s) in {time.perf_counter() - started_at:.1f}s")
+
+    # --- Pareto-front per spill ---
+    by_game = {}
+    for result in results.values():
+        by_game.setdefault(result["game"], []).append(result)
+
+    for title, game_results in by_game.items():
+        current = game_results[0] if not game_results[0]["params"] else None
+        shown = sorted(game_results, key=lambda r: r["cost"]) if args.all else pareto_frontier(game_results)
+        frontier = pareto_frontier(game_results)
+        print(f"\n🎮 {title} — {args.days:g} day(s) of {args.source} load, "
+              f"{len(frontier)}/{len(game_results)} point(s) on the Pareto frontier")
+        print(f"{'Cost':>10} {'VM-hours':>9} {'Unmet min':>10} {'Unmet pl-min':>13} {'Peak':>5}  Params")
+        print("-" * 90)
+        for r in shown:
+            params = ", ".join(f"{k}={v}" for k, v in r["params"].items()) or "(current config)"
+            mark = " ◆" if r in frontier else ""
+            print(f"{r['cost']:>10.2f} {r['vm_hours']:>9} {r['unmet_minutes']:>10.1f} "
+                  f"{r['unmet_player_minutes']:>13} {r['peak_vms']:>5}  {r['strategy']}: {params}{mark}")
+        if current is not None:
+            print(f"   Current config: {current['cost']:.2f} cost, {current['unmet_minutes']:.1f} unmet min")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(list(results.values()), f, indent=2)
+        print(f"\n💾 Wrote {total} result(s) to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# snapshot_channel.py
+# Push-kanal manager → exporter over en Unix-socket på det delte data-volumet.
+# Hver melding er 4 byte lengde (big-endian) + JSON. Modulen importerer ikke config.py,
+# så exporter-containeren trenger bare denne filen i tillegg til prometheus_exporter.py.
+import json
+import os
+import socket
+import struct
+import threading
+
+SOCKET_PATH = os.environ.get("SNAPSHOT_SOCKET", os.path.join("data", "exporter.sock"))
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+_HEADER = struct.Struct(">I")
+
+
+def _recv_exact(conn, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = conn.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("connection closed mid-message")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+class SnapshotPublisher:
+    """Manager side: sends each cycle's snapshot to the exporter (fire-and-forget)."""
+
+    def __init__(self, path: str = SOCKET_PATH, timeout: float = 2.0):
+        self.path = path
+        self.timeout = timeout
+        self._warned = False
+
+    def publish(self, snapshot: dict) -> bool:
+        payload = json.dumps(snapshot).encode("utf-8")
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                s.settimeout(self.timeout)
+                s.connect(self.path)
+                s.sendall(_HEADER.pack(len(payload)) + payload)
+        except OSError as e:
+            # Exporteren kan være nede – manageren skal ikke stoppe av den grunn
+            if not self._warned:
+                print(f"⚠️ Could not push snapshot to exporter at {self.path}: {e}")
+                self._warned = True
+            return False
+        if self._warned:
+            print(f"✅ Snapshot push to exporter at {self.path} works again")
+            self._warned = False
+        return True
+
+
+class SnapshotReceiver:
+    """Exporter side: listens on the socket and keeps the latest snapshot in memory."""
+
+    def __init__(self, path: str = SOCKET_PATH, timeout: float = 5.0):
+        self.path = path
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._latest = None
+
+    @property
+    def latest(self) -> dict | None:
+        with self._lock:
+            return self._latest
+
+    def _handle(self, conn):
+        with conn:
+            (size,) = _HEADER.unpack(_recv_exact(conn, _HEADER.size))
+            if size > MAX_MESSAGE_BYTES:
+                raise ValueError(f"snapshot too large ({size} bytes)")
+            snapshot = json.loads(_recv_exact(conn, size))
+        with self._lock:
+            self._latest = snapshot
+
+    def serve_forever(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)  # gammel socket fra forrige kjøring
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            server.bind(self.path)
+            server.listen()
+            while True:
+                conn, _ = server.accept()
+                conn.settimeout(self.timeout)  # en klient som henger skal ikke blokkere neste push
+                try:
+                    self._handle(conn)
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ Dropped bad snapshot: {e}")
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, name="snapshot-receiver", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,176 @@
+# timeseries_store.py
+import hashlib
+import math
+import os
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from config import HISTORY_DIR
+
+# Kolonnelager: én fil per kolonne per spill per døgn (UTC), rå fast-bredde verdier.
+#   data/history/<spill>-<hash>/<YYYY-MM-DD>/<kolonne>.bin
+# En append er noen få bytes på slutten av hver fil, og en spørring leser bare kolonnene
+# den trenger. Manglende verdier lagres som NaN.
+COLUMNS = {
+    "ts": "d",                 # unix-tid (sekunder)
+    "player_count": "i",
+    "expected_players": "f",
+    "vm_count": "i",
+    "hourly_cost": "f",
+    "fetch_s": "f",            # fasetider for syklusen (sekunder)
+    "decide_s": "f",
+    "actuate_s": "f",
+    "plan_s": "f",
+    "write_s": "f",
+}
+NAN = float("nan")
+
+
+def _slug(title: str) -> str:
+    # Lesbart navn + kort hash, så "Counter-Strike" og "Counter Strike" ikke deler mappe
+    readable = re.sub(r"[^A-Za-z0-9]+", "_", title).strip("_") or "_"
+    return f"{readable}-{hashlib.sha1(title.encode('utf-8')).hexdigest()[:8]}"
+
+
+def _day(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d")
+
+
+def _days(start: float, end: float):
+    day = datetime.fromtimestamp(start, timezone.utc).date()
+    last = datetime.fromtimestamp(end, timezone.utc).date()
+    while day <= last:
+        yield day.isoformat()
+        day += timedelta(days=1)
+
+
+class TimeSeriesStore:
+    """Append-only per-game history of scrapes and scaling decisions."""
+
+    def __init__(self, root: str = HISTORY_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _game_dir(self, title: str) -> str:
+        return os.path.join(self.root, _slug(title))
+
+    def append(self, title: str, row: dict):
+        """Append one row; `row` must contain "ts", missing columns are stored as NaN/0."""
+        game_dir = self._game_dir(title)
+        part = os.path.join(game_dir, _day(row["ts"]))
+        if not os.path.isdir(part):
+            os.makedirs(part, exist_ok=True)
+            with open(os.path.join(game_dir, "_title"), "w") as f:
+                f.write(title)
+        self._repair(part)
+        for col, code in COLUMNS.items():
+            value = row.get(col)
+            if value is None:
+                value = 0 if code == "i" else NAN
+            with open(os.path.join(part, f"{col}.bin"), "ab") as f:
+                array(code, [value]).tofile(f)
+
+    @staticmethod
+    def _repair(part: str):
+        """
+        Trim every column file to the number of complete rows they all have, so an
+        interrupted append never shifts later rows out of line with their "ts".
+        """
+        sizes = {}
+        for col, code in COLUMNS.items():
+            try:
+                sizes[col] = os.path.getsize(os.path.join(part, f"{col}.bin"))
+            except FileNotFoundError:
+                sizes[col] = 0
+        rows = min(size // array(COLUMNS[col]).itemsize for col, size in sizes.items())
+        for col, size in sizes.items():
+            keep = rows * array(COLUMNS[col]).itemsize
+            if size > keep:
+                with open(os.path.join(part, f"{col}.bin"), "r+b") as f:
+                    f.truncate(keep)
+
+    def append_cycle(self, rows: dict):
+        """Append one row per game: {title: row}."""
+        for title, row in rows.items():
+            self.append(title, row)
+
+    def titles(self) -> list:
+        titles = []
+        for slug in sorted(os.listdir(self.root)):
+            try:
+                with open(os.path.join(self.root, slug, "_title")) as f:
+                    titles.append(f.read())
+            except OSError:
+                continue
+        return titles
+
+    def _read_partition(self, part: str, columns) -> dict | None:
+        data = {}
+        for col in columns:
+            path = os.path.join(part, f"{col}.bin")
+            values = array(COLUMNS[col])
+            try:
+                with open(path, "rb") as f:
+                    raw = f.read()
+            except OSError:
+                return None
+            values.frombytes(raw[:len(raw) - len(raw) % values.itemsize])
+            data[col] = values
+        # En avbrutt append kan bare mangle i slutten (append() reparerer før neste rad)
+        # → kutt den ufullstendige siste raden
+        n = min(len(v) for v in data.values())
+        return {col: v[:n] for col, v in data.items()}
+
+    def query(self, title: str, start: float, end: float, columns=None) -> dict:
+        """
+        Rows with start <= ts <= end, as {column: array}. Only the requested
+        columns (plus "ts") are read from disk.
+        """
+        columns = ["ts"] + [c for c in (columns or COLUMNS) if c != "ts"]
+        unknown = set(columns) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f"unknown column(s): {', '.join(sorted(unknown))}")
+
+        result = {col: array(COLUMNS[col]) for col in columns}
+        game_dir = self._game_dir(title)
+        for day in _days(start, end):
+            data = self._read_partition(os.path.join(game_dir, day), columns)
+            if data is None:
+                continue
+            ts = data["ts"]
+            lo, hi = bisect_left(ts, start), bisect_right(ts, end)
+            for col in columns:
+                result[col].extend(data[col][lo:hi])
+        return result
+
+    def downsample(self, title: str, start: float, end: float, bucket_seconds: float,
+                   columns=None, agg: str = "mean") -> dict:
+        """
+        Aggregate rows into fixed buckets of `bucket_seconds`.
+        agg: "mean", "max", "min" or "last" (NaN values are ignored).
+        Returns {column: list}, with "ts" set to each bucket's start.
+        """
+        reducers = {
+            "mean": lambda v: sum(v) / len(v),
+            "max": max,
+            "min": min,
+            "last": lambda v: v[-1],
+        }
+        if agg not in reducers:
+            raise ValueError(f"unknown aggregation '{agg}'")
+        reduce = reducers[agg]
+
+        data = self.query(title, start, end, columns)
+        value_cols = [c for c in data if c != "ts"]
+        out = {col: [] for col in data}
+        buckets = {}
+        for i, ts in enumerate(data["ts"]):
+            buckets.setdefault(start + ((ts - start) // bucket_seconds) * bucket_seconds, []).append(i)
+        for bucket_ts in sorted(buckets):
+            idx = buckets[bucket_ts]
+            out["ts"].append(bucket_ts)
+            for col in value_cols:
+                values = [data[col][i] for i in idx if not math.isnan(data[col][i])]
+                out[col].append(reduce(values) if values else NAN)
+        return out
@@ -0,0 +1,51 @@
+# vm_agent.py
+# Lettvekts agent som kjører på hver game-VM og rapporterer spillerantall til manageren.
+# Game server-prosessen skriver nåværende spillerantall til PLAYER_COUNT_FILE, og leser
+# DRAIN_FLAG_FILE for å vite om den skal slutte å ta imot nye spillere.
+import os
+import socket
+from flask import Flask, jsonify
+
+app = Flask(__name__)
+PLAYER_COUNT_FILE = os.environ.get("PLAYER_COUNT_FILE", "/var/run/gameserver/players")
+DRAIN_FLAG_FILE = os.environ.get("DRAIN_FLAG_FILE", "/var/run/gameserver/draining")
+AGENT_PORT = int(os.environ.get("AGENT_PORT", "8080"))
+
+
+def read_player_count() -> int | None:
+    """None if the count file is missing or unreadable – never report an unknown VM as empty."""
+    try:
+        with open(PLAYER_COUNT_FILE, "r") as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def is_draining() -> bool:
+    return os.path.exists(DRAIN_FLAG_FILE)
+
+
+@app.route("/players")
+def players():
+    count = read_player_count()
+    body = jsonify(server=socket.gethostname(), players=count, draining=is_draining())
+    return (body, 503) if count is None else body
+
+
+@app.route("/drain", methods=["POST"])
+def drain():
+    os.makedirs(os.path.dirname(DRAIN_FLAG_FILE), exist_ok=True)
+    with open(DRAIN_FLAG_FILE, "w") as f:
+        f.write("1")
+    return jsonify(draining=True)
+
+
+@app.route("/undrain", methods=["POST"])
+def undrain():
+    if os.path.exists(DRAIN_FLAG_FILE):
+        os.remove(DRAIN_FLAG_FILE)
+    return jsonify(draining=False)
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=AGENT_PORT)